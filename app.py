@@ -1,35 +1,183 @@
-from flask import Flask, request, render_template, session, jsonify
-from groq import Groq
+from flask import (
+    Flask, Response, abort, g, request, render_template, session, jsonify, has_request_context,
+    send_from_directory, stream_with_context, copy_current_request_context
+)
+import plotly
 import plotly.graph_objects as go
+from plotly.offline import get_plotlyjs_version
 import sympy as sp
+import contextvars
+import hashlib
+import io
 import json
+import os
+import queue
 import re
 import numpy as np
-from PyPDF2 import PdfReader
-from docx import Document
-import pptx
 import random
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED, ALL_COMPLETED
+from concurrent.futures import TimeoutError as FutureTimeout
+from caching import LRUCache, DiskCache, TieredCache, cache_key, normalize_question
+from groq_clients import ClientPool
+from jobs import JobQueue, QueueFull, DONE, FAILED
+from metrics import Metrics, current_action
+from prompts import PROMPTS, REGISTRY, build_prompt
+from expressions import clean_expression, compile_expression, estimate_degree, is_plain_math, parse_expression
+from local_solver import solve_locally
+import viz_classifier
+from verification import EXACT, VERIFIED, CORRECTED, MISMATCH, UNVERIFIED, verify_answer
+from math_detector import DEFAULT_THRESHOLD, detect_questions, filter_math_segments
+from documents import iter_pdf_pages, iter_docx_paragraphs, iter_pptx_slides, chunk_segments
 
 app = Flask(__name__)
 app.secret_key = "some_secret_key_for_session"
 
 MODEL_NAME = "llama-3.1-8b-instant"
 
-
-def clean_expression(expr):
-    """Convert common math notation to Python syntax"""
-    expr = str(expr)
-    expr = expr.replace('²', '**2')
-    expr = expr.replace('³', '**3')
-    expr = expr.replace('⁴', '**4')
-    expr = expr.replace('⁵', '**5')
-    expr = expr.replace('^', '**')
-    expr = expr.replace('×', '*')
-    expr = expr.replace('÷', '/')
-    expr = expr.replace('√', 'sqrt')
-    expr = re.sub(r'(\d)([a-zA-Z])', r'\1*\2', expr)
-    expr = re.sub(r'(\d)\(', r'\1*(', expr)
-    return expr
+# plotly.js ships inside the plotly package; serve that copy once instead of
+# inlining it into every visualization
+PLOTLY_JS_DIR = os.path.join(os.path.dirname(plotly.__file__), 'package_data')
+PLOTLY_JS_VERSION = get_plotlyjs_version()
+PLOTLY_JS_MAX_AGE = 365 * 24 * 60 * 60
+
+# Completions are cached by (model, action, question, temperature). Only
+# temperature=0 calls are deterministic enough to reuse unless
+# LLM_CACHE_ALL_TEMPERATURES is set; LLM_CACHE_PATH='' disables the disk tier.
+LLM_CACHE_PATH = os.environ.get('LLM_CACHE_PATH', os.path.join(app.instance_path, 'llm_cache.sqlite3'))
+LLM_CACHE_TTL = int(os.environ.get('LLM_CACHE_TTL', 7 * 24 * 60 * 60))
+LLM_CACHE_MEMORY_SIZE = int(os.environ.get('LLM_CACHE_MEMORY_SIZE', 512))
+LLM_CACHE_DISK_SIZE = int(os.environ.get('LLM_CACHE_DISK_SIZE', 20000))
+LLM_CACHE_ALL_TEMPERATURES = os.environ.get('LLM_CACHE_ALL_TEMPERATURES', '').lower() in ('1', 'true', 'yes')
+
+llm_cache = TieredCache(
+    LRUCache(maxsize=LLM_CACHE_MEMORY_SIZE, ttl=LLM_CACHE_TTL),
+    DiskCache(LLM_CACHE_PATH, max_entries=LLM_CACHE_DISK_SIZE, ttl=LLM_CACHE_TTL) if LLM_CACHE_PATH else None
+)
+
+# Rendered figures keyed by the normalized visualization spec, shared by all actions
+VIZ_CACHE_SIZE = int(os.environ.get('VIZ_CACHE_SIZE', 256))
+VIZ_SPEC_FIELDS = ('viz_type', 'expression', 'data', 'details', 'max_points')
+
+viz_cache = LRUCache(maxsize=VIZ_CACHE_SIZE)
+
+# Function plots: |y| at or above PLOT_Y_LIMIT becomes a gap, and the point
+# budget can be set per request with the plot_points form field
+PLOT_Y_LIMIT = 1e6
+DEFAULT_PLOT_WINDOW = (-10.0, 10.0)
+MAX_PLOT_WINDOW = 1e3
+DEFAULT_PLOT_POINTS = 400
+MIN_PLOT_POINTS = 50
+MAX_PLOT_POINTS = 2000
+# Degrees estimated from the unexpanded expression: past the first the window
+# isn't analysed (sp.together and sp.Poly expand everything), past the second
+# there is no plot at all
+MAX_WINDOW_DEGREE = 50
+MAX_PLOT_DEGREE = 100
+
+# 'solve' answers simple questions with SymPy (local_solver) before asking the
+# LLM; responses say which one answered in solved_by
+LOCAL_SOLVER = os.environ.get('LOCAL_SOLVER', '1').lower() not in ('0', 'false', 'no')
+
+# What a /solve action does around its LLM call. local_solver: SymPy may answer
+# first. verify: the LLM answer is checked (and re-queried once on a
+# mismatch). visualize: the answer can get a plot; /solve only returns a
+# visualization_spec, and the figure is rendered by /visualize when the page
+# asks for it, or inline when the request sets visualize=1. Every action in
+# prompts.PROMPTS that isn't listed here is a plain LLM call, so adding one
+# only takes a template.
+ActionSpec = namedtuple('ActionSpec', ['local_solver', 'verify', 'visualize'], defaults=(False, False, False))
+PLAIN_ACTION = ActionSpec()
+ACTIONS = {
+    'solve': ActionSpec(local_solver=True, verify=True, visualize=True),
+    'explain': ActionSpec(visualize=True),
+    'alternative_methods': ActionSpec(visualize=True),
+}
+VISUALIZATION_TYPES = ('function', 'geometric', 'data', 'statistical', 'vector')
+MAX_SPEC_FIELD_LENGTH = 2000
+
+# Question-only plot work runs here while the LLM call is in flight
+viz_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('VIZ_WORKERS', 4)),
+    thread_name_prefix='viz'
+)
+
+# /solve_batch fans actions out over this pool; each action gets BATCH_TIMEOUT seconds.
+# The pool is shared by every batch in the process, not sized per request:
+# concurrent batches queue behind each other, and time spent queued counts
+# toward BATCH_TIMEOUT, so raise BATCH_WORKERS along with GUNICORN_THREADS
+batch_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('BATCH_WORKERS', 12)),
+    thread_name_prefix='batch'
+)
+BATCH_TIMEOUT = int(os.environ.get('BATCH_TIMEOUT', 90))
+
+# Worker processes for extracting text from long PDFs. The default, 1, keeps
+# it in-process: each range ships and re-parses the whole PDF, which was
+# slower than the serial path in every measurement so far
+PDF_WORKERS = int(os.environ.get('PDF_WORKERS', 1))
+
+# Uploaded documents are sent to the LLM in chunks of EXTRACT_CHUNK_TOKENS,
+# at most EXTRACT_CONCURRENCY at a time per upload
+EXTRACT_CHUNK_TOKENS = int(os.environ.get('EXTRACT_CHUNK_TOKENS', 2000))
+EXTRACT_CONCURRENCY = int(os.environ.get('EXTRACT_CONCURRENCY', 4))
+EXTRACT_PREAMBLE = re.compile(r'^(here (are|is)|the following|extracted|math questions)\b.*:$', re.IGNORECASE)
+# A bullet needs a space after it and a number can't run into another digit,
+# so "-3x + 4 = 1" and "3.5x + 2 = 9" keep their leading sign and digits
+EXTRACT_NUMBERING = re.compile(r'^\s*(?:[-*•]\s+|(?:q(?:uestion)?\s*)?\d+[.):](?!\d)\s*|\(\d+\)\s*)', re.IGNORECASE)
+
+EXTRACT_MODES = ('llm', 'full', 'local')
+MATH_DETECT_THRESHOLD = float(os.environ.get('MATH_DETECT_THRESHOLD', DEFAULT_THRESHOLD))
+
+# Extraction results keyed by a hash of the uploaded bytes. Per-chunk LLM
+# replies live in llm_cache, so a re-upload with a few pages changed only
+# re-extracts those. Bump EXTRACT_PARSER_VERSION whenever readers,
+# chunking or prompts change in a way that alters results. UPLOAD_CACHE_PATH=''
+# disables it.
+EXTRACT_PARSER_VERSION = 1
+UPLOAD_CACHE_PATH = os.environ.get('UPLOAD_CACHE_PATH', os.path.join(app.instance_path, 'upload_cache.sqlite3'))
+UPLOAD_CACHE_TTL = int(os.environ.get('UPLOAD_CACHE_TTL', 30 * 24 * 60 * 60))
+UPLOAD_CACHE_BYTES = int(os.environ.get('UPLOAD_CACHE_BYTES', 256 * 1024 * 1024))
+
+upload_cache = DiskCache(
+    UPLOAD_CACHE_PATH, max_entries=100000, ttl=UPLOAD_CACHE_TTL, max_bytes=UPLOAD_CACHE_BYTES
+) if UPLOAD_CACHE_PATH else None
+
+extract_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('EXTRACT_WORKERS', 16)),
+    thread_name_prefix='extract'
+)
+
+# Uploads sent to /jobs/extract run in the background; each worker accepts at
+# most JOB_QUEUE_SIZE unfinished jobs and answers 503 beyond that. Finished
+# jobs are kept for JOB_TTL seconds.
+JOB_STORE_PATH = os.environ.get('JOB_STORE_PATH', os.path.join(app.instance_path, 'jobs.sqlite3'))
+JOB_TTL = int(os.environ.get('JOB_TTL', 60 * 60))
+JOB_RETRY_AFTER = 5
+JOB_POLL_INTERVAL = 0.5
+
+job_queue = JobQueue(
+    JOB_STORE_PATH,
+    workers=int(os.environ.get('JOB_WORKERS', 4)),
+    max_pending=int(os.environ.get('JOB_QUEUE_SIZE', 32)),
+    ttl=JOB_TTL
+)
+
+# Span timings, token usage and cache hits, exposed at /metrics. Each worker
+# writes its numbers to METRICS_DIR so any worker can report the totals;
+# METRICS_DIR='' keeps them per process.
+METRICS_DIR = os.environ.get('METRICS_DIR', os.path.join(app.instance_path, 'metrics'))
+
+metrics = Metrics(METRICS_DIR or None)
+
+# One Groq client per API key, all sharing a keep-alive connection pool
+groq_clients = ClientPool(
+    max_clients=int(os.environ.get('GROQ_CLIENT_POOL_SIZE', 256)),
+    idle_timeout=int(os.environ.get('GROQ_CLIENT_IDLE_TIMEOUT', 900)),
+    max_connections=int(os.environ.get('GROQ_MAX_CONNECTIONS', 100))
+)
 
 
 @app.route('/', methods=['GET', 'POST'])
@@ -48,6 +196,44 @@ def api_guide():
 def welcome():
     return render_template('index.html')
 
+@app.route('/vendor/plotly-<version>.min.js')
+def plotly_bundle(version):
+    """Serve the plotly.js bundle; the version in the URL makes it safe to cache forever"""
+    # Only the installed version's URL is immutable; any other would pin a stale bundle
+    if version != PLOTLY_JS_VERSION:
+        abort(404)
+    response = send_from_directory(PLOTLY_JS_DIR, 'plotly.min.js', max_age=PLOTLY_JS_MAX_AGE)
+    response.cache_control.immutable = True
+    return response
+
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+
+@app.after_request
+def record_request_time(response):
+    # Streaming responses are timed up to their first byte; their stages have spans
+    start = g.pop('request_start', None)
+    if start is not None:
+        metrics.observe(
+            'mathsolver_http_request_duration_seconds', time.perf_counter() - start,
+            endpoint=request.endpoint or 'unknown', method=request.method, status=response.status_code
+        )
+    return response
+
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus metrics for all workers"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+@app.context_processor
+def inject_plotly_version():
+    return {'plotly_js_version': PLOTLY_JS_VERSION}
+
 @app.route('/solve', methods=['POST'])
 def solve():
     if 'api_key' not in session:
@@ -59,569 +245,730 @@ def solve():
     if not question:
         return jsonify({'error': 'Question is required'})
 
-    client = Groq(api_key=session['api_key'])
-
-    # Route to different handlers based on action
-    if action == 'solve':
-        return handle_solve_with_visualization(question, client)
-    elif action == 'explain':
-        return handle_explain_with_visualization(question, client)
-    elif action == 'alternative_methods':
-        return handle_alternative_methods(question, client)
-    elif action == 'practice_similar':
-        return handle_practice_similar(question, client)
-    elif action == 'common_mistakes':
-        return handle_common_mistakes(question, client)
-    elif action == 'real_world':
-        return handle_real_world_application(question, client)
-    elif action == 'difficulty_ladder':
-        return handle_difficulty_ladder(question, client)
-    elif action == 'tutor_mode':
-        return handle_tutor_mode(question, client)
-    elif action == 'eli5':
-        return handle_eli5(question, client)
-    elif action == 'concept_map':
-        return handle_concept_map(question, client)
-    elif action == 'difficulty_rating':
-        return handle_difficulty_rating(question, client)
-    elif action == 'worksheet':
-        return handle_generate_worksheet(question, client)
-    else:
+    client = groq_clients.get(session['api_key'])
+    return jsonify(run_action(action, question, client))
+
+
+def run_action(action, question, client, **options):
+    """Run an action through ACTION_MIDDLEWARE and the shared pipeline; returns the response dict"""
+    return action_pipeline(action, question, client, **options)
+
+
+@app.route('/solve_batch', methods=['POST'])
+def solve_batch():
+    """Run several actions for one question concurrently and return every result.
+
+    Actions come as repeated 'actions' fields or one comma-separated field.
+    Each result carries its own timing and error, so one failing action
+    doesn't sink the rest.
+    """
+    if 'api_key' not in session:
+        return jsonify({'error': 'API key missing'})
+
+    question = request.form.get('question')
+    if not question:
+        return jsonify({'error': 'Question is required'})
+
+    actions = []
+    for value in request.form.getlist('actions'):
+        for action in value.split(','):
+            action = action.strip()
+            if action and action not in actions:
+                actions.append(action)
+
+    if not actions:
+        return jsonify({'error': 'At least one action is required'})
+    invalid = [action for action in actions if action not in PROMPTS]
+    if invalid:
+        return jsonify({'error': f"Invalid action: {', '.join(invalid)}"})
+
+    client = groq_clients.get(session['api_key'])
+
+    def timed(action):
+        start = time.perf_counter()
+        result = run_action(action, question, client)
+        result['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        return result
+
+    start = time.perf_counter()
+    deadline = time.monotonic() + BATCH_TIMEOUT
+    futures = [(action, batch_executor.submit(copy_current_request_context(timed), action)) for action in actions]
+    results = []
+    for action, future in futures:
+        try:
+            result = future.result(timeout=max(0, deadline - time.monotonic()))
+        except FutureTimeout:
+            # Before Python 3.11 this isn't the builtin TimeoutError. Cancelling
+            # stops an action that is still queued from spending an LLM call
+            future.cancel()
+            result = {'error': f'Timed out after {BATCH_TIMEOUT}s'}
+        results.append({'action': action, **result})
+
+    return jsonify({
+        'question': question,
+        'results': results,
+        'elapsed_ms': round((time.perf_counter() - start) * 1000, 1)
+    })
+
+
+def record_cache(cache, hit):
+    metrics.inc('mathsolver_cache_requests_total', cache=cache, result='hit' if hit else 'miss')
+
+
+def record_token_usage(usage):
+    """Count prompt and completion tokens from a completion's usage, if it has one"""
+    if usage is None:
+        return
+    for kind in ('prompt', 'completion'):
+        tokens = getattr(usage, f'{kind}_tokens', None)
+        if tokens:
+            metrics.inc('mathsolver_llm_tokens_total', tokens, action=current_action.get(), kind=kind)
+
+
+def completion_key(action, question, temperature):
+    return cache_key(MODEL_NAME, action, normalize_question(question), temperature)
+
+
+def completion_args(action, prompt):
+    """Keyword arguments for a chat completion from a built Prompt"""
+    metrics.inc('mathsolver_prompt_tokens_total', prompt.tokens, action=action)
+    if prompt.truncated:
+        metrics.inc('mathsolver_prompt_truncations_total', action=action)
+    args = {
+        'model': MODEL_NAME,
+        'messages': [{"role": "user", "content": prompt.text}],
+        'temperature': prompt.temperature
+    }
+    if prompt.max_tokens is not None:
+        args['max_tokens'] = prompt.max_tokens
+    return args
+
+
+def chat_completion(client, action, prompt, question):
+    """Run a single-message completion, reusing a cached answer when the call is deterministic"""
+    cacheable = prompt.temperature == 0 or LLM_CACHE_ALL_TEMPERATURES
+    key = completion_key(action, question, prompt.temperature)
+
+    if cacheable:
+        cached = llm_cache.get(key)
+        record_cache('llm', cached is not None)
+        if cached is not None:
+            return cached
+
+    with metrics.span('llm'):
+        completion = client.chat.completions.create(**completion_args(action, prompt))
+    record_token_usage(getattr(completion, 'usage', None))
+    content = completion.choices[0].message.content.strip()
+
+    if cacheable:
+        llm_cache.set(key, content)
+    return content
+
+
+def stream_completion(client, action, prompt, question):
+    """Yield a completion's text as it is generated; cached answers come back in one chunk"""
+    cacheable = prompt.temperature == 0 or LLM_CACHE_ALL_TEMPERATURES
+    key = completion_key(action, question, prompt.temperature)
+
+    if cacheable:
+        cached = llm_cache.get(key)
+        record_cache('llm', cached is not None)
+        if cached is not None:
+            yield cached
+            return
+
+    parts = []
+    with metrics.span('llm'):
+        stream = client.chat.completions.create(**completion_args(action, prompt), stream=True)
+        for chunk in stream:
+            # Groq reports usage on the last chunk under x_groq
+            record_token_usage(getattr(getattr(chunk, 'x_groq', None), 'usage', None))
+            if not chunk.choices:
+                continue
+            text = chunk.choices[0].delta.content
+            if text:
+                parts.append(text)
+                yield text
+
+    if cacheable:
+        llm_cache.set(key, ''.join(parts).strip())
+
+
+def local_answer(question):
+    """The local SymPy answer to question, or None if the LLM has to answer it"""
+    if not LOCAL_SOLVER:
+        return None
+    with metrics.span('local_solver'):
+        return solve_locally(question)
+
+
+def verify_solution(client, question, answer):
+    """Check an LLM answer with SymPy; on a mismatch re-query once and keep whichever answer holds up.
+
+    Returns (answer, verification). A corrected answer replaces the cached
+    one, so the next request for the same question gets it without a retry.
+    """
+    with metrics.span('verify'):
+        verification = verify_answer(question, answer)
+    if verification != MISMATCH:
+        return answer, verification
+
+    prompt = build_prompt('solve_recheck', question, previous=answer)
+    retried = chat_completion(client, 'solve_recheck', prompt, question)
+    with metrics.span('verify'):
+        status = verify_answer(question, retried)
+    if status == VERIFIED:
+        temperature = PROMPTS['solve'].temperature
+        if temperature == 0 or LLM_CACHE_ALL_TEMPERATURES:
+            llm_cache.set(completion_key('solve', question, temperature), retried)
+        return retried, CORRECTED
+    if status == UNVERIFIED:
+        return retried, UNVERIFIED
+    return answer, MISMATCH
+
+
+def sse_event(event, payload):
+    """Format one server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+@app.route('/solve_stream', methods=['POST'])
+def solve_stream():
+    """Stream the answer for any /solve action as server-sent events.
+
+    The action runs through the same pipeline as /solve, on its own thread,
+    with a completion step that forwards text as it arrives. Emits 'token'
+    events with that text, then 'done' with the same fields /solve returns
+    (or 'error'). For the actions that plot, 'done' carries a
+    visualization_spec for /visualize; with visualize=1 the figure is sent
+    in a 'visualization' event instead.
+    """
+    if 'api_key' not in session:
+        return jsonify({'error': 'API key missing'})
+
+    question = request.form.get('question')
+    action = request.form.get('action')
+
+    if not question:
+        return jsonify({'error': 'Question is required'})
+    if action not in PROMPTS:
         return jsonify({'error': 'Invalid action'})
 
+    client = groq_clients.get(session['api_key'])
+    events = queue.Queue()
 
-def handle_solve_with_visualization(question, client):
-    """Solve the problem and automatically generate visualization"""
-    try:
-        solve_prompt = f"Solve this maths question and provide the answer:\n{question}"
-        
-        completion = client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[{"role": "user", "content": solve_prompt}],
-            temperature=0
-        )
-        
-        answer = completion.choices[0].message.content.strip()
-        viz_analysis = analyze_for_visualization(question, answer, client)
-        
-        if viz_analysis.get('can_visualize', False):
-            graph_html = create_visualization(viz_analysis, question, answer)
-            if graph_html:
-                return jsonify({
-                    'result': answer,
-                    'visualization': graph_html,
-                    'viz_type': viz_analysis.get('viz_type', 'graph')
+    def send(event, payload):
+        events.put(sse_event(event, payload))
+
+    @copy_current_request_context
+    def run():
+        try:
+            result = run_action(action, question, client, complete=streaming_completion(send))
+            if 'error' in result:
+                send('error', result)
+                return
+            if 'visualization' in result:
+                send('visualization', {
+                    'visualization': result.pop('visualization'),
+                    'viz_type': result.pop('viz_type')
                 })
-        
-        return jsonify({'result': answer})
-            
-    except Exception as e:
-        return jsonify({'error': f'Error: {str(e)}'})
+            send('done', result)
+        finally:
+            events.put(None)
+
+    threading.Thread(target=run, name='stream', daemon=True).start()
+
+    def generate():
+        while (event := events.get()) is not None:
+            yield event
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+def streaming_completion(send):
+    """A completion step for execute_action that sends each chunk as a 'token' event"""
+    def complete(client, action, prompt, question):
+        parts = []
+        for text in stream_completion(client, action, prompt, question):
+            parts.append(text)
+            send('token', {'text': text})
+        # A corrected answer arrives with 'done' and replaces the streamed text
+        return ''.join(parts).strip()
+    return complete
+
+
+def answer_locally(spec, question):
+    """The SymPy answer for actions that allow one, or None"""
+    return local_answer(question) if spec.local_solver else None
+
+
+def check_answer(spec, client, question, answer):
+    """Return (answer, verification); verification is None for actions that aren't checked"""
+    if not spec.verify:
+        return answer, None
+    return verify_solution(client, question, answer)
+
+
+def execute_action(action, question, client, complete=chat_completion):
+    """The one call path every action takes: local answer, LLM, verification, plot.
+
+    complete runs the LLM call; /solve_stream passes one that streams.
+    """
+    spec = ACTIONS.get(action, PLAIN_ACTION)
+    pending_viz = start_visualization(question) if spec.visualize else None
+
+    answer = answer_locally(spec, question)
+    solved_by, verification = 'local', EXACT
+    if answer is None:
+        answer = complete(client, action, build_prompt(action, question), question)
+        answer, verification = check_answer(spec, client, question, answer)
+        solved_by = 'llm'
+
+    result = {'result': answer}
+    if spec.local_solver:
+        result['solved_by'] = solved_by
+    if verification is not None:
+        result['verification'] = verification
+    if spec.visualize:
+        add_visualization(result, pending_viz, question, answer, client)
+    return result
+
+
+def reject_unknown_action(handler):
+    """Answer actions missing from PROMPTS with an error, before they get a metrics label"""
+    def run(action, question, client, **options):
+        if action not in PROMPTS:
+            return {'error': 'Invalid action'}
+        return handler(action, question, client, **options)
+    return run
+
+
+def instrument_action(handler):
+    """Label spans with the action, time it as a whole and count error responses"""
+    def run(action, question, client, **options):
+        with metrics.action(action), metrics.span('total'):
+            result = handler(action, question, client, **options)
+        if 'error' in result:
+            metrics.inc('mathsolver_errors_total', action=action, stage='handler')
+        return result
+    return run
+
+
+def catch_action_errors(handler):
+    """Turn an exception anywhere in the action into an error response"""
+    def run(action, question, client, **options):
+        try:
+            return handler(action, question, client, **options)
+        except Exception as e:
+            return {'error': f'Error: {str(e)}'}
+    return run
 
 
-def handle_explain_with_visualization(question, client):
-    """Explain the problem step-by-step and generate visualization"""
-    try:
-        explain_prompt = f"Explain step-by-step solution for:\n{question}"
-        
-        completion = client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[{"role": "user", "content": explain_prompt}],
-            temperature=0
-        )
-        
-        explanation = completion.choices[0].message.content.strip()
-        viz_analysis = analyze_for_visualization(question, explanation, client)
-        
-        if viz_analysis.get('can_visualize', False):
-            graph_html = create_visualization(viz_analysis, question, explanation)
-            if graph_html:
-                return jsonify({
-                    'result': explanation,
-                    'visualization': graph_html,
-                    'viz_type': viz_analysis.get('viz_type', 'graph')
-                })
-        
-        return jsonify({'result': explanation})
-            
-    except Exception as e:
-        return jsonify({'error': f'Error: {str(e)}'})
+def build_pipeline(middleware, handler):
+    """Wrap handler in each middleware, the first one outermost"""
+    for wrap in reversed(middleware):
+        handler = wrap(handler)
+    return handler
 
 
-def handle_alternative_methods(question, client):
-    """Show 2-3 different methods to solve the same problem"""
-    try:
-        prompt = f"""
-        Show 2-3 DIFFERENT methods to solve this problem: {question}
-        
-        Format your response as:
-        
-        METHOD 1: [Method Name]
-        [Step-by-step solution using this method]
-        
-        METHOD 2: [Method Name]
-        [Step-by-step solution using this method]
-        
-        METHOD 3: [Method Name] (if applicable)
-        [Step-by-step solution using this method]
-        
-        WHICH TO USE: Brief note on when each method is best
-        """
-        
-        completion = client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.3
-        )
-        
-        result = completion.choices[0].message.content.strip()
-        
-        # Try to create visualization for the problem
-        viz_analysis = analyze_for_visualization(question, result, client)
-        graph_html = None
-        if viz_analysis.get('can_visualize', False):
-            graph_html = create_visualization(viz_analysis, question, result)
-        
-        if graph_html:
-            return jsonify({
-                'result': result,
-                'visualization': graph_html,
-                'viz_type': viz_analysis.get('viz_type', 'graph')
-            })
-        
-        return jsonify({'result': result})
-        
-    except Exception as e:
-        return jsonify({'error': f'Error: {str(e)}'})
+# Each middleware takes the next handler and returns a handler with the same
+# (action, question, client, **options) signature, passing options through, so cross-cutting behaviour for every
+# action goes here rather than into the pipeline
+ACTION_MIDDLEWARE = (reject_unknown_action, instrument_action, catch_action_errors)
+action_pipeline = build_pipeline(ACTION_MIDDLEWARE, execute_action)
 
 
-def handle_practice_similar(question, client):
-    """Generate 5 similar practice problems"""
-    try:
-        prompt = f"""
-        Based on this problem: {question}
-        
-        Generate 5 similar practice problems with INCREASING difficulty.
-        For each problem, provide:
-        - The problem statement
-        - The answer (hidden behind a spoiler marker)
-        
-        Format:
-        PROBLEM 1: [Easy - similar to original]
-        [problem text]
-        Answer: [answer]
-        
-        PROBLEM 2: [Medium]
-        [problem text]
-        Answer: [answer]
-        
-        ... continue for 5 problems total
-        """
-        
-        completion = client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.7
-        )
-        
-        result = completion.choices[0].message.content.strip()
-        return jsonify({'result': result})
-        
-    except Exception as e:
-        return jsonify({'error': f'Error: {str(e)}'})
+def analyze_question_for_visualization(question, max_points=DEFAULT_PLOT_POINTS):
+    """Question-only part of analyze_for_visualization; returns None when the answer is needed"""
+    spec = viz_classifier.classify(question)
+    if not spec.can_visualize:
+        return None
+    if spec.viz_type == viz_classifier.FUNCTION:
+        return spec.as_dict(max_points=max_points)
+    return spec.as_dict()
 
 
-def handle_common_mistakes(question, client):
-    """Show common mistakes students make"""
-    try:
-        prompt = f"""
-        For this problem: {question}
-        
-        List the 3-5 most COMMON MISTAKES students make when solving this.
-        For each mistake:
-        1. Show the incorrect approach
-        2. Explain WHY it's wrong
-        3. Show the correct approach
-        
-        Format:
-        MISTAKE 1: [Brief title]
-        Incorrect approach: [what students do wrong]
-        Why it's wrong: [explanation]
-        Correct approach: [right way]
-        
-        Continue for all common mistakes...
-        """
-        
-        completion = client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.3
-        )
-        
-        result = completion.choices[0].message.content.strip()
-        return jsonify({'result': result})
-        
-    except Exception as e:
-        return jsonify({'error': f'Error: {str(e)}'})
+def analyze_for_visualization(question, answer, client):
+    """Analyze the question and answer to determine what visualization to create"""
 
+    with metrics.span('classify'):
+        viz_analysis = analyze_question_for_visualization(question, plot_point_budget())
+        if viz_analysis is not None:
+            return viz_analysis
 
-def handle_real_world_application(question, client):
-    """Show real-world applications"""
-    try:
-        prompt = f"""
-        For this math problem: {question}
-        
-        Explain 3 REAL-WORLD applications where this type of math is actually used.
-        Include:
-        - Specific profession/industry
-        - Concrete example scenario
-        - Why this math matters there
-        
-        Make it interesting and relatable to students!
-        
-        Format:
-        APPLICATION 1: [Field/Industry]
-        Scenario: [Concrete example]
-        Why it matters: [Explanation]
-        
-        Continue for 3 applications...
-        """
-        
-        completion = client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.5
-        )
-        
-        result = completion.choices[0].message.content.strip()
-        return jsonify({'result': result})
-        
-    except Exception as e:
-        return jsonify({'error': f'Error: {str(e)}'})
+        return viz_classifier.classify_with_answer(question, answer).as_dict()
 
 
-def handle_difficulty_ladder(question, client):
-    """Show easier and harder versions"""
-    try:
-        prompt = f"""
-        Based on this problem: {question}
-        
-        Create a difficulty ladder:
-        
-        EASIER VERSION (Beginner):
-        [Simpler problem with same concept]
-        Solution: [brief solution]
-        
-        CURRENT PROBLEM (Intermediate):
-        {question}
-        
-        HARDER VERSION (Advanced):
-        [More complex problem with same concept]
-        Solution: [brief solution]
-        
-        EXPERT VERSION (Challenge):
-        [Very difficult problem with same concept]
-        Solution: [brief solution]
-        """
-        
-        completion = client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.5
-        )
-        
-        result = completion.choices[0].message.content.strip()
-        return jsonify({'result': result})
-        
-    except Exception as e:
-        return jsonify({'error': f'Error: {str(e)}'})
+def render_figure(fig):
+    """Serialize a figure as Plotly JSON for the page's shared plotly.js bundle"""
+    with metrics.span('serialize'):
+        return fig.to_json()
 
 
-def handle_tutor_mode(question, client):
-    """Give hints instead of direct answers"""
-    try:
-        prompt = f"""
-        Act as a patient tutor. For this problem: {question}
-        
-        DO NOT give the answer directly. Instead provide:
-        
-        1. WHAT TYPE OF PROBLEM: Identify what math concept this is
-        2. KEY CONCEPT: What principle/formula is needed?
-        3. FIRST STEP: What should the student do first? (be specific but don't solve)
-        4. HINT FOR MIDDLE: What to watch out for in the middle steps
-        5. HOW TO CHECK: How can they verify their answer is correct?
-        
-        Encourage them to try solving it themselves!
-        """
-        
-        completion = client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.3
-        )
-        
-        result = completion.choices[0].message.content.strip()
-        return jsonify({'result': result})
-        
-    except Exception as e:
-        return jsonify({'error': f'Error: {str(e)}'})
+def visualization_key(viz_analysis):
+    """Cache key for a visualization spec, built from the fields the plotters read"""
+    spec = {field: str(viz_analysis.get(field, '')).strip() for field in VIZ_SPEC_FIELDS}
+    return cache_key('visualization', spec)
 
 
-def handle_eli5(question, client):
-    """Explain like I'm 5"""
-    try:
-        prompt = f"""
-        Explain this math problem to a 5-year-old: {question}
-        
-        Use:
-        - Simple words
-        - Fun analogies (cookies, toys, animals, etc.)
-        - Short sentences
-        - No jargon
-        
-        Make it fun and easy to understand!
-        Then show the solution in simple terms.
-        """
-        
-        completion = client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.5
-        )
-        
-        result = completion.choices[0].message.content.strip()
-        return jsonify({'result': result})
-        
-    except Exception as e:
-        return jsonify({'error': f'Error: {str(e)}'})
+def prerender_visualization(question):
+    """Start the question-only visualization work in the background while the LLM answers"""
+    max_points = plot_point_budget()
 
+    def render():
+        with metrics.span('classify'):
+            viz_analysis = analyze_question_for_visualization(question, max_points)
+        if viz_analysis is None:
+            return None
+        return viz_analysis, create_visualization(viz_analysis, question, '')
 
-def handle_concept_map(question, client):
-    """Show concept map and prerequisites"""
-    try:
-        prompt = f"""
-        For this problem: {question}
-        
-        Create a concept map showing:
-        
-        PREREQUISITES (What you need to know first):
-        - [Concept 1]
-        - [Concept 2]
-        - [Concept 3]
-        
-        THIS PROBLEM USES:
-        - [Main concept 1]
-        - [Main concept 2]
-        - [Main concept 3]
-        
-        NEXT STEPS (What to learn after this):
-        - [Advanced topic 1]
-        - [Advanced topic 2]
-        - [Advanced topic 3]
-        
-        GRADE LEVEL: [What grade typically learns this]
-        """
-        
-        completion = client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.3
-        )
-        
-        result = completion.choices[0].message.content.strip()
-        return jsonify({'result': result})
-        
-    except Exception as e:
-        return jsonify({'error': f'Error: {str(e)}'})
+    # Run with this request's context so the spans keep their action label
+    return viz_executor.submit(contextvars.copy_context().run, render)
 
 
-def handle_difficulty_rating(question, client):
-    """Rate problem difficulty"""
-    try:
-        prompt = f"""
-        Analyze this problem: {question}
-        
-        Provide:
-        
-        DIFFICULTY RATING: [1-10 scale]
-        
-        GRADE LEVEL: [What grade]
-        
-        TIME ESTIMATE: [How long it should take]
-        
-        COMPLEXITY FACTORS:
-        - [What makes it easy/hard]
-        - [Skills required]
-        - [Common challenges]
-        
-        RECOMMENDATION: [Who should attempt this problem]
-        """
-        
-        completion = client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.3
-        )
-        
-        result = completion.choices[0].message.content.strip()
-        return jsonify({'result': result})
-        
-    except Exception as e:
-        return jsonify({'error': f'Error: {str(e)}'})
+def finish_visualization(pending, question, answer, client):
+    """Return (viz_analysis, figure), falling back to the answer-based analysis if needed"""
+    prerendered = pending.result()
+    if prerendered is not None:
+        return prerendered
 
+    viz_analysis = analyze_for_visualization(question, answer, client)
+    figure = None
+    if viz_analysis.get('can_visualize', False):
+        figure = create_visualization(viz_analysis, question, answer)
+    return viz_analysis, figure
 
-def handle_generate_worksheet(question, client):
-    """Generate a practice worksheet"""
-    try:
-        prompt = f"""
-        Based on this problem: {question}
-        
-        Create a PRACTICE WORKSHEET with 10 problems of varying difficulty.
-        
-        Format:
-        
-        === PRACTICE WORKSHEET ===
-        Topic: [Identify the topic]
-        
-        SECTION A: Easy (Problems 1-3)
-        1. [problem]
-        2. [problem]
-        3. [problem]
-        
-        SECTION B: Medium (Problems 4-7)
-        4. [problem]
-        5. [problem]
-        6. [problem]
-        7. [problem]
-        
-        SECTION C: Hard (Problems 8-10)
-        8. [problem]
-        9. [problem]
-        10. [problem]
-        
-        === ANSWER KEY ===
-        1. [answer]
-        2. [answer]
-        ... (all answers)
-        """
-        
-        completion = client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.7
-        )
-        
-        result = completion.choices[0].message.content.strip()
-        return jsonify({'result': result})
-        
-    except Exception as e:
-        return jsonify({'error': f'Error: {str(e)}'})
 
+def visualization_requested():
+    """True if the request asked for figures inline with visualize=1"""
+    if not has_request_context():
+        return False
+    return request.values.get('visualize', '').lower() in ('1', 'true', 'yes')
 
-def analyze_for_visualization(question, answer, client):
-    """Analyze the question and answer to determine what visualization to create"""
-    
-    question_lower = question.lower()
-    
-    # FORCE visualization for common patterns
-    if re.search(r'x[\^²³⁴\*]|[xy]\s*=|f\(x\)|plot|graph|solve.*x', question_lower):
-        expr_match = re.search(r'[xy]\s*=\s*([^,\n]+)', question)
-        if expr_match:
-            expression = expr_match.group(1).strip()
-        else:
-            expr_match = re.search(r'([\d\w\+\-\*\/\^\²³⁴\(\)\s]+[xy][\d\w\+\-\*\/\^\²³⁴\(\)\s]*)', question)
-            if expr_match:
-                expression = expr_match.group(1).strip()
-            else:
-                expression = question.replace('solve', '').replace('Solve', '').strip()
-        
-        return {
-            'can_visualize': True,
-            'viz_type': 'function',
-            'expression': expression,
-            'data': '',
-            'details': 'function plot'
-        }
-    
-    # Check for shapes
-    if any(word in question_lower for word in ['circle', 'square', 'triangle', 'rectangle', 'area', 'perimeter']):
-        return {
-            'can_visualize': True,
-            'viz_type': 'geometric',
-            'expression': question,
-            'data': '',
-            'details': question
-        }
-    
-    # Check for lists of numbers
-    numbers = re.findall(r'\d+', question + answer[:200])
-    if len(numbers) >= 3:
-        if 'mean' in question_lower or 'average' in question_lower or 'distribution' in question_lower:
-            return {
-                'can_visualize': True,
-                'viz_type': 'statistical',
-                'expression': '',
-                'data': ','.join(numbers),
-                'details': 'statistical analysis'
-            }
-        else:
-            return {
-                'can_visualize': True,
-                'viz_type': 'data',
-                'expression': '',
-                'data': ','.join(numbers),
-                'details': 'data visualization'
-            }
-    
-    return {'can_visualize': False, 'viz_type': 'none'}
+
+def start_visualization(question):
+    """Prerender in the background, but only when the figure will be sent inline"""
+    return prerender_visualization(question) if visualization_requested() else None
+
+
+def add_visualization(result, pending, question, answer, client):
+    """Attach the figure if it was requested, otherwise only the spec for a later /visualize call"""
+    if pending is not None:
+        viz_analysis, figure = finish_visualization(pending, question, answer, client)
+        if figure:
+            result['visualization'] = figure
+            result['viz_type'] = viz_analysis.get('viz_type', 'graph')
+        return result
+
+    # Classifying is cheap; evaluating and serializing the plot is what's deferred
+    viz_analysis = analyze_for_visualization(question, answer, client)
+    if viz_analysis.get('can_visualize', False):
+        result['visualization_spec'] = viz_analysis
+    return result
+
+
+def spec_from_request(payload):
+    """Validate a visualization spec sent to /visualize; returns (viz_analysis, None) or (None, error)"""
+    spec = payload.get('spec')
+    if isinstance(spec, str):
+        try:
+            spec = json.loads(spec)
+        except ValueError:
+            return None, 'Spec must be JSON'
+    if spec is None:
+        question = payload.get('question')
+        if not question:
+            return None, 'A spec or a question is required'
+        spec = analyze_for_visualization(question, payload.get('answer') or '', None)
+    if not isinstance(spec, dict):
+        return None, 'Spec must be an object'
+
+    viz_type = spec.get('viz_type')
+    if viz_type not in VISUALIZATION_TYPES:
+        return None, 'Nothing to visualize' if viz_type in (None, 'none') else 'Invalid viz_type'
+
+    viz_analysis = {'can_visualize': True, 'viz_type': viz_type}
+    for field in ('expression', 'data', 'details'):
+        value = str(spec.get(field) or '')
+        if len(value) > MAX_SPEC_FIELD_LENGTH:
+            return None, f'{field} is too long'
+        viz_analysis[field] = value
+    if viz_type == 'function':
+        # Names are checked before sympify sees the text; parse_expression refuses power towers
+        expression = viz_analysis['expression']
+        if not is_plain_math(expression) or parse_expression(expression) is None:
+            return None, 'expression must be plain math that can be plotted'
+        try:
+            points = int(payload.get('plot_points') or spec.get('max_points') or DEFAULT_PLOT_POINTS)
+        except (TypeError, ValueError):
+            points = DEFAULT_PLOT_POINTS
+        viz_analysis['max_points'] = max(MIN_PLOT_POINTS, min(MAX_PLOT_POINTS, points))
+    return viz_analysis, None
+
+
+@app.route('/visualize', methods=['POST'])
+def visualize():
+    """Render the figure for a visualization_spec from /solve (or for a question and answer)"""
+    if 'api_key' not in session:
+        return jsonify({'error': 'API key missing'})
+
+    payload = request.get_json(silent=True) or request.form.to_dict()
+    with metrics.action('visualize'):
+        viz_analysis, error = spec_from_request(payload)
+        if error:
+            return jsonify({'error': error})
+        figure = create_visualization(viz_analysis, '', '')
+    if not figure:
+        return jsonify({'error': 'Could not create a visualization'})
+    return jsonify({'visualization': figure, 'viz_type': viz_analysis['viz_type']})
 
 
 def create_visualization(viz_analysis, question, answer):
-    """Create visualization based on analysis"""
-    
+    """Create visualization based on analysis, reusing the figure for an identical spec"""
+
+    key = visualization_key(viz_analysis)
+    cached = viz_cache.get(key)
+    record_cache('visualization', cached is not None)
+    if cached is not None:
+        # Failed renders are cached as '' so they aren't retried either
+        return cached or None
+
     viz_type = viz_analysis.get('viz_type', 'none')
-    
+    figure = None
+
     try:
-        if viz_type == 'function':
-            return create_function_plot(viz_analysis)
-        elif viz_type == 'geometric':
-            return create_geometric_plot(viz_analysis)
-        elif viz_type == 'data':
-            return create_data_plot(viz_analysis)
-        elif viz_type == 'statistical':
-            return create_statistical_plot(viz_analysis)
-        elif viz_type == 'vector':
-            return create_vector_plot(viz_analysis)
+        with metrics.span('plot', viz_type=viz_type):
+            figure = plot_figure(viz_type, viz_analysis)
     except Exception as e:
         print(f"Visualization creation error: {str(e)}")
-    
+
+    viz_cache.set(key, figure or '')
+    return figure
+
+
+def plot_figure(viz_type, viz_analysis):
+    """Dispatch a spec to its create_*_plot function"""
+    if viz_type == 'function':
+        return create_function_plot(viz_analysis)
+    elif viz_type == 'geometric':
+        return create_geometric_plot(viz_analysis)
+    elif viz_type == 'data':
+        return create_data_plot(viz_analysis)
+    elif viz_type == 'statistical':
+        return create_statistical_plot(viz_analysis)
+    elif viz_type == 'vector':
+        return create_vector_plot(viz_analysis)
     return None
 
 
+def evaluate_pointwise(expr, x, x_vals):
+    """Evaluate expr at each x value with SymPy substitution (slow fallback path)"""
+    y_vals = []
+    for val in x_vals:
+        try:
+            y = float(expr.subs(x, val))
+            if abs(y) < PLOT_Y_LIMIT:
+                y_vals.append(y)
+            else:
+                y_vals.append(None)
+        except:
+            y_vals.append(None)
+    return y_vals
+
+
+def evaluate_vectorized(expr, x, x_vals, func=None):
+    """Evaluate expr over the whole x grid with a lambdified NumPy callable.
+
+    Pass func to reuse an already lambdified expr. Poles, complex results and
+    |y| >= PLOT_Y_LIMIT become NaN gaps, matching the pointwise path. Raises
+    if NumPy can't handle the expression.
+    """
+    if expr.free_symbols - {x}:
+        # Other free symbols never evaluate to a number
+        return np.full(len(x_vals), np.nan)
+
+    if func is None:
+        func = sp.lambdify(x, expr, modules='numpy')
+    with np.errstate(all='ignore'):
+        y_vals = np.asarray(func(x_vals))
+    y_vals = np.broadcast_to(y_vals, np.shape(x_vals))
+
+    if np.iscomplexobj(y_vals):
+        y_vals = np.where(y_vals.imag == 0, y_vals.real, np.nan)
+    y_vals = y_vals.astype(float)
+
+    y_vals[~np.isfinite(y_vals) | (np.abs(y_vals) >= PLOT_Y_LIMIT)] = np.nan
+    return y_vals
+
+
+def evaluate_function(expr, x, x_vals, func=None):
+    """Evaluate expr over x_vals, falling back to per-point substitution if NumPy can't"""
+    try:
+        return evaluate_vectorized(expr, x, x_vals, func)
+    except Exception:
+        y_vals = evaluate_pointwise(expr, x, x_vals)
+        return np.array([np.nan if y is None else y for y in y_vals], dtype=float)
+
+
+def plot_point_budget():
+    """Read the per-request plot point budget, clamped to sane limits"""
+    points = DEFAULT_PLOT_POINTS
+    if has_request_context():
+        try:
+            points = int(request.form.get('plot_points', points))
+        except (TypeError, ValueError):
+            pass
+    return max(MIN_PLOT_POINTS, min(MAX_PLOT_POINTS, points))
+
+
+def real_roots(poly_expr, x):
+    """Return the real roots of a polynomial in x as floats"""
+    poly = sp.Poly(poly_expr, x)
+    if poly.degree() < 1 or poly.degree() > MAX_WINDOW_DEGREE:
+        return []
+    coeffs = [float(c) for c in poly.all_coeffs()]
+    return [float(r.real) for r in np.roots(coeffs) if abs(r.imag) < 1e-9]
+
+
+def choose_plot_window(expr, x):
+    """Pick an x-window that frames the real roots, poles and extrema of expr.
+
+    Only rational functions up to MAX_WINDOW_DEGREE are analysed; anything
+    else (trig, exp, ...) keeps the default window.
+    """
+    try:
+        if estimate_degree(expr) > MAX_WINDOW_DEGREE or not expr.is_rational_function(x):
+            return DEFAULT_PLOT_WINDOW
+        numerator, denominator = sp.fraction(sp.together(expr))
+        slope_numerator, _ = sp.fraction(sp.together(sp.diff(expr, x)))
+        points = real_roots(numerator, x) + real_roots(denominator, x) + real_roots(slope_numerator, x)
+    except Exception:
+        return DEFAULT_PLOT_WINDOW
+
+    points = [p for p in points if abs(p) < MAX_PLOT_WINDOW]
+    if not points:
+        return DEFAULT_PLOT_WINDOW
+
+    # Keep the axes in view so the plot stays readable
+    points.append(0.0)
+    low, high = min(points), max(points)
+    padding = max(0.5 * (high - low), 3.0)
+    return (low - padding, high + padding)
+
+
+def adaptive_sample(func, x_min, x_max, max_points, initial_points=33, tolerance=2e-3):
+    """Sample func on [x_min, x_max], refining where the curve bends or breaks.
+
+    Each round evaluates the midpoints of the still-active intervals in one
+    vectorized call. Intervals where the midpoint sits close to the straight
+    line between their ends are flat enough and are retired; the others are
+    split. Gap boundaries (NaN on one side only) are always split, and
+    intervals that are still steep at the minimum width get a NaN break so
+    asymptotes aren't drawn as vertical lines. Breaks count toward
+    max_points, and when the budget runs out first, intervals that still
+    jump from one edge of the screen to the other get a break as well.
+    """
+    initial_points = min(initial_points, max_points)
+    x_vals = np.linspace(x_min, x_max, initial_points)
+    y_vals = func(x_vals)
+    min_width = (x_max - x_min) / (initial_points * 256)
+
+    finite = y_vals[np.isfinite(y_vals)]
+    if len(finite) > 1:
+        low, high = np.percentile(finite, [5, 95])
+        scale = max(high - low, 1e-9)
+    else:
+        low, high, scale = -1.0, 1.0, 1.0
+    # Detail far outside the bulk of the curve (near asymptotes) is off-screen
+    band = (low - scale, high + scale)
+
+    active = np.ones(len(x_vals) - 1, dtype=bool)
+    breaks = []
+
+    while active.any():
+        left = np.nonzero(active)[0]
+        mid_x = (x_vals[left] + x_vals[left + 1]) / 2
+        mid_y = func(mid_x)
+
+        y_left, y_right = y_vals[left], y_vals[left + 1]
+        clip_left, clip_right, clip_mid = (np.clip(y, *band) for y in (y_left, y_right, mid_y))
+        error = np.abs(clip_mid - (clip_left + clip_right) / 2) / scale
+        # A gap edge only needs locating if the curve beside it is on-screen
+        on_screen = ((band[0] <= y_left) & (y_left <= band[1])) | ((band[0] <= y_right) & (y_right <= band[1]))
+        error = np.where(np.isnan(error), np.where(on_screen, np.inf, 0), error)
+        # Around a pole, unlike on a steep line, the ends straddle the screen's middle and the
+        # midpoint isn't between them; once an end is off-screen the line would cross the plot
+        straddles = (y_left - (low + high) / 2) * (y_right - (low + high) / 2) < 0
+        between = (np.minimum(y_left, y_right) <= mid_y) & (mid_y <= np.maximum(y_left, y_right))
+        pole = straddles & ~between
+        jumping = pole & ((np.minimum(y_left, y_right) < band[0]) | (np.maximum(y_left, y_right) > band[1]))
+
+        # Every wanted interval costs one point: a midpoint, or a break once it's too narrow
+        wanted = error > tolerance
+        too_narrow = (x_vals[left + 1] - x_vals[left]) < min_width
+        # Points held back so each pole still being narrowed can get a break if the budget runs out
+        budget = max_points - len(x_vals) - len(breaks) - (wanted & pole).sum()
+        chosen = wanted
+        if wanted.sum() > budget:
+            # Out of points: every jump gets a break, as far as room allows, and the rest of
+            # the budget goes to the worst of the other intervals
+            room = max_points - len(x_vals) - len(breaks)
+            breaks.extend(mid_x[wanted & jumping][:max(room, 0)])
+            others = wanted & ~jumping
+            keep = np.argsort(-np.where(others, error, -1))[:max(budget, 0)]
+            chosen = np.zeros_like(wanted)
+            chosen[keep] = others[keep]
+        breaks.extend(mid_x[chosen & too_narrow & np.isfinite(mid_y)])
+        split = chosen & ~too_narrow
+
+        # Merge the accepted midpoints into the sorted sample
+        x_vals = np.concatenate([x_vals, mid_x[split]])
+        y_vals = np.concatenate([y_vals, mid_y[split]])
+        order = np.argsort(x_vals, kind='stable')
+        x_vals, y_vals = x_vals[order], y_vals[order]
+
+        # Both halves of each split interval stay active, everything else retires
+        new_points = np.zeros(len(x_vals), dtype=bool)
+        new_points[np.searchsorted(x_vals, mid_x[split])] = True
+        active = new_points[:-1] | new_points[1:]
+
+    if breaks:
+        x_vals = np.concatenate([x_vals, breaks])
+        y_vals = np.concatenate([y_vals, np.full(len(breaks), np.nan)])
+        order = np.argsort(x_vals, kind='stable')
+        x_vals, y_vals = x_vals[order], y_vals[order]
+
+    return x_vals, y_vals
+
+
 def create_function_plot(viz_analysis):
     """Create a plot for mathematical functions"""
     try:
         expression = viz_analysis.get('expression', '')
-        if not expression:
+        if not expression or not is_plain_math(expression):
+            return None
+
+        expr, func = compile_expression(expression)
+        if expr is None:
+            print(f"Function plot error: could not parse {expression!r}")
+            return None
+        if estimate_degree(expr) > MAX_PLOT_DEGREE:
+            print(f"Function plot error: degree of {expression!r} is too high to plot")
             return None
-            
         expression = clean_expression(expression)
         x = sp.Symbol('x')
-        expr = sp.sympify(expression)
-        
-        x_vals = np.linspace(-10, 10, 400)
-        y_vals = []
-        
-        for val in x_vals:
-            try:
-                y = float(expr.subs(x, val))
-                if abs(y) < 1e6:
-                    y_vals.append(y)
-                else:
-                    y_vals.append(None)
-            except:
-                y_vals.append(None)
-        
+
+        x_min, x_max = choose_plot_window(expr, x)
+        max_points = viz_analysis.get('max_points', DEFAULT_PLOT_POINTS)
+        with metrics.span('evaluate'):
+            x_vals, y_vals = adaptive_sample(
+                lambda xs: evaluate_function(expr, x, xs, func), x_min, x_max, max_points
+            )
+
         fig = go.Figure()
         fig.add_trace(go.Scatter(
             x=x_vals,
@@ -644,7 +991,7 @@ def create_function_plot(viz_analysis):
             showlegend=True
         )
         
-        return fig.to_html(full_html=False)
+        return render_figure(fig)
         
     except Exception as e:
         print(f"Function plot error: {str(e)}")
@@ -754,7 +1101,7 @@ def create_geometric_plot(viz_analysis):
             showlegend=True
         )
         
-        return fig.to_html(full_html=False)
+        return render_figure(fig)
         
     except Exception as e:
         print(f"Geometric plot error: {str(e)}")
@@ -795,7 +1142,7 @@ def create_data_plot(viz_analysis):
             showlegend=False
         )
         
-        return fig.to_html(full_html=False)
+        return render_figure(fig)
         
     except Exception as e:
         print(f"Data plot error: {str(e)}")
@@ -842,7 +1189,7 @@ def create_statistical_plot(viz_analysis):
             showlegend=True
         )
         
-        return fig.to_html(full_html=False)
+        return render_figure(fig)
         
     except Exception as e:
         print(f"Statistical plot error: {str(e)}")
@@ -900,7 +1247,7 @@ def create_vector_plot(viz_analysis):
                 showlegend=True
             )
             
-            return fig.to_html(full_html=False)
+            return render_figure(fig)
         
         return None
         
@@ -914,61 +1261,310 @@ def upload_and_extract():
     if 'api_key' not in session:
         return jsonify({'error': 'API key missing'})
 
+    upload, error = read_upload()
+    if error:
+        return jsonify({'error': error})
+
+    client = groq_clients.get(session['api_key'])
+    return jsonify(extract_upload(*upload, client))
+
+
+def read_upload():
+    """Validate the uploaded file and options; returns ((data, file_type, mode, threshold), None) or (None, error)"""
     file = request.files.get('file')
     if not file:
-        return jsonify({'error': 'No file provided'})
+        return None, 'No file provided'
 
     filename = file.filename.lower()
 
+    # mode: 'llm' (default) sends only likely-math lines to Groq, 'full' sends
+    # everything and 'local' skips the LLM and returns the detected lines
+    mode = request.form.get('mode', 'llm')
+    if mode not in EXTRACT_MODES:
+        return None, f"Invalid mode. Supported: {', '.join(EXTRACT_MODES)}"
+    try:
+        threshold = float(request.form.get('threshold', MATH_DETECT_THRESHOLD))
+    except ValueError:
+        return None, 'Threshold must be a number'
+
     if filename.endswith(('jpg', 'jpeg', 'png')):
-        return jsonify({'error': 'Image AI extraction not supported with Groq.'})
-    elif filename.endswith('pdf'):
-        return extract_from_pdf(file)
-    elif filename.endswith('docx'):
-        return extract_from_word(file)
-    elif filename.endswith('pptx'):
-        return extract_from_ppt(file)
-    else:
-        return jsonify({'error': 'Unsupported file type. Supported: PDF, DOCX, PPTX'})
+        return None, 'Image AI extraction not supported with Groq.'
+    file_type = filename.rsplit('.', 1)[-1]
+    if file_type not in UPLOAD_READERS:
+        return None, 'Unsupported file type. Supported: PDF, DOCX, PPTX'
+
+    return (file.read(), file_type, mode, threshold), None
+
+
+def extract_upload(data, file_type, mode, threshold, client, on_progress=None):
+    """Extract questions from an uploaded file's bytes, reusing a cached result when there is one"""
+    key = upload_key(data, file_type, mode, threshold)
+    cached = upload_cache.get(key) if upload_cache is not None else None
+    if upload_cache is not None:
+        record_cache('upload', cached is not None)
+    if cached is not None:
+        return dict(cached, cached=True)
+
+    reader = UPLOAD_READERS[file_type]
+    with metrics.action('upload'), metrics.span('extract', file_type=file_type):
+        result = reader(io.BytesIO(data), client, mode, threshold, on_progress)
+    if upload_cache is not None and 'error' not in result and not result.get('partial'):
+        upload_cache.set(key, result)
+    return result
+
+
+@app.route('/jobs/extract', methods=['POST'])
+def submit_extract_job():
+    """Queue an upload for extraction and return its job id straight away"""
+    if 'api_key' not in session:
+        return jsonify({'error': 'API key missing'})
+
+    upload, error = read_upload()
+    if error:
+        return jsonify({'error': error})
 
+    client = groq_clients.get(session['api_key'])
+    try:
+        job_id = job_queue.submit('extract', extract_upload, *upload, client, owner=job_owner())
+    except QueueFull:
+        response = jsonify({'error': 'Server is busy, please try again shortly'})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(JOB_RETRY_AFTER)
+        return response
 
-def extract_from_pdf(file):
-    reader = PdfReader(file)
-    text = ""
-    for page in reader.pages:
-        text += page.extract_text() or ""
-    return extract_math_from_text(text)
+    return jsonify({
+        'job_id': job_id,
+        'status_url': f'/jobs/{job_id}',
+        'result_url': f'/jobs/{job_id}/result',
+        'events_url': f'/jobs/{job_id}/events'
+    }), 202
 
 
-def extract_from_word(file):
-    doc = Document(file)
-    text = "\n".join([para.text for para in doc.paragraphs])
-    return extract_math_from_text(text)
+def job_owner():
+    """Jobs are only visible to the API key that submitted them"""
+    return hashlib.sha256(session['api_key'].encode('utf-8')).hexdigest()
 
 
-def extract_from_ppt(file):
-    presentation = pptx.Presentation(file)
-    text = ""
-    for slide in presentation.slides:
-        for shape in slide.shapes:
-            if hasattr(shape, "text"):
-                text += shape.text + "\n"
-    return extract_math_from_text(text)
+def job_summary(job):
+    return {key: value for key, value in job.items() if key not in ('result', 'error')}
 
 
-def extract_math_from_text(text):
-    client = Groq(api_key=session['api_key'])
-    prompt = f"Extract only math questions (no explanations) from this text:\n{text}"
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Status and progress of a job, without its result"""
+    if 'api_key' not in session:
+        return jsonify({'error': 'API key missing'})
 
-    try:
-        completion = client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0
+    job = job_queue.get(job_id, owner=job_owner())
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    summary = job_summary(job)
+    if 'error' in job:
+        summary['error'] = job['error']
+    return jsonify(summary)
+
+
+@app.route('/jobs/<job_id>/result')
+def job_result(job_id):
+    """The job's result once it has finished; 202 with its status until then"""
+    if 'api_key' not in session:
+        return jsonify({'error': 'API key missing'})
+
+    job = job_queue.get(job_id, owner=job_owner())
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if job['status'] == FAILED:
+        return jsonify({'error': job.get('error', 'Error: job failed')})
+    if job['status'] != DONE:
+        return jsonify(job_summary(job)), 202
+    return jsonify(job['result'])
+
+
+@app.route('/jobs/<job_id>/events')
+def job_events(job_id):
+    """Stream a job's progress as server-sent events: 'progress', then 'done' or 'error'"""
+    if 'api_key' not in session:
+        return jsonify({'error': 'API key missing'})
+
+    owner = job_owner()
+    if job_queue.get(job_id, owner=owner) is None:
+        return jsonify({'error': 'Job not found'}), 404
+
+    def generate():
+        last = None
+        while True:
+            job = job_queue.get(job_id, owner=owner)
+            if job is None:
+                yield sse_event('error', {'error': 'Job not found'})
+                return
+            if job['status'] == DONE:
+                yield sse_event('done', job['result'])
+                return
+            if job['status'] == FAILED:
+                yield sse_event('error', {'error': job.get('error', 'Error: job failed')})
+                return
+            state = (job['status'], job['progress']['done'], job['progress']['total'])
+            if state != last:
+                last = state
+                yield sse_event('progress', job_summary(job))
+            time.sleep(JOB_POLL_INTERVAL)
+
+    return Response(
+        generate(),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+def upload_key(data, file_type, mode, threshold):
+    """Cache key for a whole upload: content hash plus everything that changes the result"""
+    digest = hashlib.sha256(data).hexdigest()
+    return cache_key('upload', EXTRACT_PARSER_VERSION, MODEL_NAME, file_type, digest, mode, threshold)
+
+
+def cached_extraction(chunk):
+    """The LLM reply to a chunk from an earlier upload, from the entry chat_completion stored, or None"""
+    cached = llm_cache.get(completion_key('extract', chunk, REGISTRY['extract'].temperature))
+    record_cache('upload_chunk', cached is not None)
+    return cached
+
+
+def extract_from_pdf(file, client, mode='llm', threshold=MATH_DETECT_THRESHOLD, on_progress=None):
+    timings = []
+
+    def pages():
+        for page_number, text, seconds in iter_pdf_pages(file, workers=PDF_WORKERS):
+            timings.append({'page': page_number, 'chars': len(text), 'ms': round(seconds * 1000, 2)})
+            metrics.observe('mathsolver_document_page_duration_seconds', seconds, file_type='pdf')
+            yield text
+
+    result = extract_questions(pages(), client, mode, threshold, on_progress)
+    result['pages'] = timings
+    return result
+
+
+def extract_from_word(file, client, mode='llm', threshold=MATH_DETECT_THRESHOLD, on_progress=None):
+    return extract_questions(iter_docx_paragraphs(file), client, mode, threshold, on_progress)
+
+
+def extract_from_ppt(file, client, mode='llm', threshold=MATH_DETECT_THRESHOLD, on_progress=None):
+    return extract_questions(iter_pptx_slides(file), client, mode, threshold, on_progress)
+
+
+UPLOAD_READERS = {
+    'pdf': extract_from_pdf,
+    'docx': extract_from_word,
+    'pptx': extract_from_ppt
+}
+
+
+def extract_questions(segments, client, mode='llm', threshold=MATH_DETECT_THRESHOLD, on_progress=None):
+    """Extract math questions from document segments in the given mode"""
+    if mode == 'local':
+        questions = detect_questions(segments, threshold)
+        if not questions:
+            return {'error': 'No math questions found in document'}
+        text = "\n".join(
+            f"{number}. {EXTRACT_NUMBERING.sub('', question)}" for number, question in enumerate(questions, 1)
         )
-        return jsonify({'text': completion.choices[0].message.content.strip()})
-    except Exception as e:
-        return jsonify({'error': f'Groq API Error: {str(e)}'})
+        return {'text': text, 'mode': mode}
+
+    stats = None
+    if mode == 'llm':
+        stats = {}
+        segments = filter_math_segments(segments, threshold, stats)
+
+    result = extract_math_from_segments(segments, client, on_progress)
+    result['mode'] = mode
+    if stats is not None:
+        result['filtered'] = stats
+    return result
+
+
+def extract_math_from_text(text, client):
+    """Ask the LLM for the math questions in one chunk of document text"""
+    return chat_completion(client, 'extract', build_prompt('extract', text), text)
+
+
+def question_lines(extracted):
+    """Split an extraction reply into question lines, dropping any preamble"""
+    lines = []
+    for line in extracted.splitlines():
+        line = line.strip()
+        if line and not EXTRACT_PREAMBLE.match(line):
+            lines.append(line)
+    return lines
+
+
+def question_identity(line):
+    """Normalize a question for de-duplication: no numbering, case or extra spaces"""
+    return ' '.join(EXTRACT_NUMBERING.sub('', line).lower().split())
+
+
+def extract_math_from_segments(segments, client, on_progress=None):
+    """Extract math questions from a document, chunk by chunk, with bounded concurrency.
+
+    Chunks are sent as soon as they are read, at most EXTRACT_CONCURRENCY at a
+    time; chunks already extracted from an earlier upload are taken from
+    llm_cache instead. Results are merged in document order and de-duplicated. Failed
+    chunks are reported under 'errors' with 'partial' set, as long as at least
+    one chunk succeeded. on_progress(done, total) is called after each chunk;
+    total is only final once reading has finished.
+    """
+    replies = {}
+    errors = []
+    in_flight = {}
+    submitted = 0
+    reused = 0
+
+    def collect(return_when):
+        finished, _ = wait(in_flight, return_when=return_when)
+        for future in finished:
+            index = in_flight.pop(future)
+            try:
+                replies[index] = future.result()
+            except Exception as e:
+                errors.append({'chunk': index + 1, 'error': f'Groq API Error: {str(e)}'})
+            if on_progress:
+                on_progress(len(replies) + len(errors), submitted)
+
+    for index, chunk in enumerate(chunk_segments(segments, EXTRACT_CHUNK_TOKENS)):
+        submitted += 1
+        cached = cached_extraction(chunk)
+        if cached is not None:
+            replies[index] = cached
+            reused += 1
+            if on_progress:
+                on_progress(len(replies) + len(errors), submitted)
+            continue
+        if len(in_flight) >= EXTRACT_CONCURRENCY:
+            collect(FIRST_COMPLETED)
+        context = contextvars.copy_context()
+        in_flight[extract_executor.submit(context.run, extract_math_from_text, chunk, client)] = index
+    if in_flight:
+        collect(ALL_COMPLETED)
+
+    if submitted == 0:
+        return {'error': 'No math questions found in document'}
+    if not replies:
+        return {'error': errors[0]['error'], 'errors': errors}
+
+    questions = []
+    seen = set()
+    for index in sorted(replies):
+        for line in question_lines(replies[index]):
+            identity = question_identity(line)
+            if identity and identity not in seen:
+                seen.add(identity)
+                questions.append(EXTRACT_NUMBERING.sub('', line))
+
+    # Each chunk numbers its questions from 1, so renumber the merged list
+    text = "\n".join(f"{number}. {question}" for number, question in enumerate(questions, 1))
+    result = {'text': text, 'chunks': submitted, 'reused_chunks': reused}
+    if errors:
+        result['partial'] = True
+        result['errors'] = sorted(errors, key=lambda error: error['chunk'])
+    return result
 
 
 def extract_json_from_response(response_text):
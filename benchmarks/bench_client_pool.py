@@ -0,0 +1,57 @@
+"""Compare a Groq client per request against the pooled clients in groq_clients.
+
+Counts the TCP connections the stub server sees and the time per call for
+a handful of users making repeated requests.
+
+Usage: python benchmarks/bench_client_pool.py [--users N] [--calls N]
+"""
+import argparse
+import os
+import sys
+import time
+
+from groq import Groq
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_groq import FakeGroqServer  # noqa: E402
+from groq_clients import ClientPool  # noqa: E402
+
+
+def run(get_client, server, users, calls):
+    """Make calls requests per user and return (connections opened, ms per call)"""
+    server.connections = 0
+    start = time.perf_counter()
+    for _ in range(calls):
+        for user in range(users):
+            client = get_client(f'gsk_user_{user}')
+            client.chat.completions.create(
+                model='llama-3.1-8b-instant',
+                messages=[{'role': 'user', 'content': 'Solve x^2 + 5x + 6 = 0'}]
+            )
+    elapsed = time.perf_counter() - start
+    return server.connections, elapsed * 1000 / (users * calls)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=5)
+    parser.add_argument('--calls', type=int, default=20)
+    args = parser.parse_args()
+
+    server = FakeGroqServer().start()
+    os.environ['GROQ_BASE_URL'] = server.base_url
+    pool = ClientPool()
+
+    fresh = run(lambda key: Groq(api_key=key), server, args.users, args.calls)
+    pooled = run(pool.get, server, args.users, args.calls)
+
+    print(f"{'mode':<12}{'connections':>14}{'ms/call':>10}")
+    print(f"{'per-request':<12}{fresh[0]:>14}{fresh[1]:>10.2f}")
+    print(f"{'pooled':<12}{pooled[0]:>14}{pooled[1]:>10.2f}")
+    print(f"pool stats: {pool.stats()}")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
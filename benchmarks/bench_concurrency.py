@@ -0,0 +1,106 @@
+"""Throughput of /solve under gunicorn sync workers versus threaded workers.
+
+Starts the fake Groq server and a gunicorn instance per worker class,
+logs in once, then fires concurrent /solve requests and reports how many
+complete per second. Every request waits the full fake LLM latency, so sync
+workers top out at workers / latency requests per second.
+
+Usage: python benchmarks/bench_concurrency.py [--requests N] [--concurrency N]
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fake_groq import FakeGroqServer  # noqa: E402
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_gunicorn(worker_class, workers, threads, groq_url, **extra_env):
+    """Start gunicorn with the repo config overridden by env, and wait until it answers"""
+    port = free_port()
+    env = dict(
+        os.environ,
+        GROQ_BASE_URL=groq_url,
+        LLM_CACHE_PATH='',
+        GUNICORN_BIND=f'127.0.0.1:{port}',
+        GUNICORN_WORKER_CLASS=worker_class,
+        GUNICORN_WORKERS=str(workers),
+        GUNICORN_THREADS=str(threads),
+        **extra_env
+    )
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base_url = f'http://127.0.0.1:{port}'
+    for _ in range(100):
+        try:
+            httpx.get(base_url + '/welcome', timeout=1)
+            return process, base_url
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError(f'gunicorn ({worker_class}) did not start')
+
+
+def drive(base_url, total, concurrency):
+    """Send total /solve requests with the given concurrency and return requests per second"""
+    with httpx.Client(base_url=base_url, timeout=120) as login:
+        login.post('/', data={'api_key': 'gsk_benchmark'})
+        cookies = dict(login.cookies)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    client = httpx.Client(base_url=base_url, cookies=cookies, timeout=120, limits=limits)
+
+    def one(i):
+        # practice_similar runs at temperature 0.7, so it's never served from cache
+        response = client.post('/solve', data={'question': f'Solve x + {i} = 0', 'action': 'practice_similar'})
+        return 'result' in response.json()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        ok = sum(pool.map(one, range(total)))
+    elapsed = time.perf_counter() - start
+    client.close()
+    return ok, total / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=64)
+    parser.add_argument('--latency', type=float, default=0.5)
+    args = parser.parse_args()
+
+    groq = FakeGroqServer(latency=args.latency).start()
+    print(f"{'worker class':<14}{'ok':>6}{'req/s':>10}")
+    for worker_class, threads in (('sync', 1), ('gthread', args.threads)):
+        # gunicorn silently switches sync workers to gthread when threads > 1
+        process, base_url = start_gunicorn(worker_class, args.workers, threads, groq.base_url)
+        try:
+            ok, throughput = drive(base_url, args.requests, args.concurrency)
+            print(f'{worker_class:<14}{ok:>6}{throughput:>10.1f}')
+        finally:
+            process.terminate()
+            process.wait()
+    groq.shutdown()
+
+
+if __name__ == '__main__':
+    main()
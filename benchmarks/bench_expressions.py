@@ -0,0 +1,94 @@
+"""Compare the old clean_expression + sympify + lambdify chain with the cached parser.
+
+Usage: python benchmarks/bench_expressions.py [--repeat N]
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+import sympy as sp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from expressions import clean_expression, compile_expression  # noqa: E402
+
+EXPRESSIONS = [
+    'x^2 + 5x + 6',
+    '3x² + 2x - 5',
+    'x³ - 4x',
+    '1/x',
+    '(x^2 - 1)/(x - 2)',
+    '2sin(x)',
+    'x(x+1)',
+    '(x+1)(x-1)',
+    '√x + 1',
+    'exp(x)',
+    'x*sin(x)',
+    'not valid ((',
+]
+
+
+def legacy_clean_expression(expr):
+    """clean_expression as it was before the translate table and implicit multiplication"""
+    expr = str(expr)
+    expr = expr.replace('²', '**2')
+    expr = expr.replace('³', '**3')
+    expr = expr.replace('⁴', '**4')
+    expr = expr.replace('⁵', '**5')
+    expr = expr.replace('^', '**')
+    expr = expr.replace('×', '*')
+    expr = expr.replace('÷', '/')
+    expr = expr.replace('√', 'sqrt')
+    expr = re.sub(r'(\d)([a-zA-Z])', r'\1*\2', expr)
+    expr = re.sub(r'(\d)\(', r'\1*(', expr)
+    return expr
+
+
+def legacy_compile(text):
+    x = sp.Symbol('x')
+    try:
+        expr = sp.sympify(legacy_clean_expression(text))
+        return expr, sp.lambdify(x, expr, modules='numpy')
+    except Exception:
+        return None, None
+
+
+def timed(func, repeat):
+    """Total milliseconds for repeat passes of func over EXPRESSIONS"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in EXPRESSIONS:
+            func(text)
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    legacy = timed(legacy_compile, args.repeat)
+    compile_expression.cache_clear()
+    cold = timed(compile_expression, 1)
+    warm = timed(compile_expression, args.repeat)
+    clean = timed(clean_expression, args.repeat * 100) / 100
+
+    calls = len(EXPRESSIONS) * args.repeat
+    print(f"{'path':<34}{'total (ms)':>12}{'per call (us)':>16}")
+    print(f"{'legacy clean + sympify + lambdify':<34}{legacy:>12.2f}{legacy * 1000 / calls:>16.1f}")
+    print(f"{'compile_expression, first call':<34}{cold:>12.2f}{cold * 1000 / len(EXPRESSIONS):>16.1f}")
+    print(f"{'compile_expression, cached':<34}{warm:>12.2f}{warm * 1000 / calls:>16.1f}")
+    print(f"{'clean_expression only':<34}{clean:>12.2f}{clean * 1000 / calls:>16.1f}")
+
+    print()
+    print(f"{'expression':<22}{'legacy parse':<24}{'new parse':<24}")
+    for text in EXPRESSIONS:
+        old_expr, _ = legacy_compile(text)
+        new_expr, _ = compile_expression(text)
+        print(f"{text:<22}{str(old_expr):<24}{str(new_expr):<24}")
+
+
+if __name__ == '__main__':
+    main()
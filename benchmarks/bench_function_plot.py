@@ -0,0 +1,72 @@
+"""Compare per-point SymPy substitution against the lambdified NumPy path.
+
+Usage: python benchmarks/bench_function_plot.py [--repeat N]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import sympy as sp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import clean_expression, evaluate_pointwise, evaluate_vectorized  # noqa: E402
+
+EXPRESSIONS = [
+    'x^2 + 5x + 6',
+    '3x² + 2x - 5',
+    'x³ - 4x',
+    '1/x',
+    '(x^2 - 1)/(x - 2)',
+    'sin(x)',
+    'tan(x)',
+    'sqrt(x)',
+    'exp(x)',
+    'log(x)',
+    'Abs(x) - 3',
+    'x*sin(x)',
+]
+
+
+def best_of(func, repeat):
+    """Return the fastest wall-clock time of repeat calls, in milliseconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def same_output(pointwise, vectorized):
+    """Check that both paths produce the same values and the same gaps"""
+    expected = np.array([np.nan if y is None else y for y in pointwise], dtype=float)
+    return np.allclose(expected, vectorized, equal_nan=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    x = sp.Symbol('x')
+    x_vals = np.linspace(-10, 10, 400)
+
+    print(f"{'expression':<22}{'subs (ms)':>12}{'lambdify (ms)':>16}{'speedup':>10}  match")
+    total_old = total_new = 0.0
+    for raw in EXPRESSIONS:
+        expr = sp.sympify(clean_expression(raw))
+        old = best_of(lambda: evaluate_pointwise(expr, x, x_vals), args.repeat)
+        new = best_of(lambda: evaluate_vectorized(expr, x, x_vals), args.repeat)
+        match = same_output(evaluate_pointwise(expr, x, x_vals), evaluate_vectorized(expr, x, x_vals))
+        total_old += old
+        total_new += new
+        print(f"{raw:<22}{old:>12.2f}{new:>16.3f}{old / new:>9.0f}x  {'yes' if match else 'NO'}")
+
+    print(f"{'total':<22}{total_old:>12.2f}{total_new:>16.3f}{total_old / total_new:>9.0f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+"""Micro-benchmarks for the create_*_plot functions, with a regression check.
+
+For every case in a fixed corpus (polynomials, rationals, trig, long number
+lists, every shape keyword, vectors) this times building the figure and
+serializing it separately and records the size of the JSON. Times are the
+median of --repeat runs after one warm-up run, so the expression caches are
+warm, as they are for a repeated question in production.
+
+Save a baseline, change the code, then compare against it:
+
+    python benchmarks/bench_plots.py --save baseline.json
+    python benchmarks/bench_plots.py --compare baseline.json --threshold 0.25
+
+--compare exits with status 1 if any case got slower than the baseline by
+more than --threshold (a fraction) and by more than --min-ms, or if its
+output grew by more than --threshold.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+import numpy as np
+import plotly
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Keep the benchmark's spans out of the app's shared metrics directory
+os.environ.setdefault('METRICS_DIR', '')
+
+import app  # noqa: E402
+
+NUMBERS_10 = ', '.join(str(n) for n in range(3, 33, 3))
+NUMBERS_100 = ', '.join(str((n * 37) % 101) for n in range(100))
+NUMBERS_1000 = ', '.join(str((n * 7919) % 1009) for n in range(1000))
+
+# (case name, plotter, viz_analysis)
+CASES = [
+    ('poly_quadratic', 'function', {'expression': 'x^2 + 5x + 6'}),
+    ('poly_cubic', 'function', {'expression': 'x³ - 4x'}),
+    ('poly_quintic', 'function', {'expression': 'x^5 - 3x^3 + x - 2'}),
+    ('rational_simple', 'function', {'expression': '1/x'}),
+    ('rational_poles', 'function', {'expression': '(x^2 - 1)/(x - 2)'}),
+    ('trig_sin', 'function', {'expression': 'sin(x)'}),
+    ('trig_tan', 'function', {'expression': 'tan(x)'}),
+    ('trig_product', 'function', {'expression': 'x*sin(x)'}),
+    ('exp_log', 'function', {'expression': 'exp(x) + log(x)'}),
+    ('circle', 'geometric', {'details': 'circle 5', 'expression': 'circle with radius 5'}),
+    ('square', 'geometric', {'details': 'square 4', 'expression': 'square with side 4'}),
+    ('triangle', 'geometric', {'details': 'triangle 6', 'expression': 'equilateral triangle with side 6'}),
+    ('rectangle', 'geometric', {'details': 'rectangle 8 3', 'expression': 'rectangle 8 by 3'}),
+    ('data_10', 'data', {'data': NUMBERS_10}),
+    ('data_100', 'data', {'data': NUMBERS_100}),
+    ('data_1000', 'data', {'data': NUMBERS_1000}),
+    ('stats_10', 'statistical', {'data': NUMBERS_10}),
+    ('stats_100', 'statistical', {'data': NUMBERS_100}),
+    ('stats_1000', 'statistical', {'data': NUMBERS_1000}),
+    ('vector_2d', 'vector', {'data': '3,4'}),
+    ('vector_components', 'vector', {'expression': '-2.5i + 7j'}),
+]
+
+PLOTTERS = {
+    'function': 'create_function_plot',
+    'geometric': 'create_geometric_plot',
+    'data': 'create_data_plot',
+    'statistical': 'create_statistical_plot',
+    'vector': 'create_vector_plot',
+}
+
+
+def build_figure(plotter, spec):
+    """Run a create_*_plot function but return the figure instead of its JSON"""
+    serialize = app.render_figure
+    app.render_figure = lambda fig: fig
+    try:
+        return getattr(app, PLOTTERS[plotter])(dict(spec, viz_type=plotter))
+    finally:
+        app.render_figure = serialize
+
+
+def measure(plotter, spec, repeat):
+    """Median build and serialize milliseconds and the JSON size for one case"""
+    fig = build_figure(plotter, spec)
+    if fig is None:
+        return None
+    builds, serializations = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fig = build_figure(plotter, spec)
+        builds.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        output = fig.to_json()
+        serializations.append(time.perf_counter() - start)
+    return {
+        'plotter': plotter,
+        'build_ms': statistics.median(builds) * 1000,
+        'serialize_ms': statistics.median(serializations) * 1000,
+        'bytes': len(output),
+    }
+
+
+def run(repeat, only=None):
+    results = {}
+    for name, plotter, spec in CASES:
+        if only and only not in name and only != plotter:
+            continue
+        result = measure(plotter, spec, repeat)
+        if result is None:
+            print(f"{name}: no figure", file=sys.stderr)
+            continue
+        results[name] = result
+    return results
+
+
+def regressions(results, baseline, threshold, min_ms):
+    """(case, field, old, new) for every measurement worse than the baseline beyond the limits"""
+    found = []
+    for name, result in results.items():
+        old = baseline.get(name)
+        if old is None:
+            continue
+        for field in ('build_ms', 'serialize_ms'):
+            if result[field] > old[field] * (1 + threshold) and result[field] - old[field] > min_ms:
+                found.append((name, field, old[field], result[field]))
+        if result['bytes'] > old['bytes'] * (1 + threshold):
+            found.append((name, 'bytes', old['bytes'], result['bytes']))
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=15)
+    parser.add_argument('--only', help='run cases whose name contains this, or one plotter type')
+    parser.add_argument('--save', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='baseline JSON file from an earlier --save')
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed fractional slowdown or growth')
+    parser.add_argument('--min-ms', type=float, default=1.0, help='ignore slowdowns smaller than this')
+    args = parser.parse_args()
+
+    results = run(args.repeat, args.only)
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+
+    print(f"{'case':<20}{'build ms':>10}{'json ms':>10}{'KB':>9}{'vs baseline':>14}")
+    for name, result in results.items():
+        change = ''
+        if name in baseline:
+            old = baseline[name]['build_ms'] + baseline[name]['serialize_ms']
+            change = f"{(result['build_ms'] + result['serialize_ms']) / old - 1:+.0%}"
+        print(f"{name:<20}{result['build_ms']:>10.2f}{result['serialize_ms']:>10.2f}"
+              f"{result['bytes'] / 1024:>9.1f}{change:>14}")
+
+    print()
+    print(f"{'plotter':<20}{'build ms':>10}{'json ms':>10}{'KB':>9}")
+    for plotter in PLOTTERS:
+        rows = [result for result in results.values() if result['plotter'] == plotter]
+        if rows:
+            print(f"{plotter:<20}{sum(r['build_ms'] for r in rows):>10.2f}"
+                  f"{sum(r['serialize_ms'] for r in rows):>10.2f}{sum(r['bytes'] for r in rows) / 1024:>9.1f}")
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({
+                'meta': {
+                    'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                    'python': platform.python_version(),
+                    'numpy': np.__version__,
+                    'plotly': plotly.__version__,
+                    'repeat': args.repeat,
+                },
+                'results': results,
+            }, f, indent=2)
+
+    if args.compare:
+        found = regressions(results, baseline, args.threshold, args.min_ms)
+        print()
+        if not found:
+            print(f"No regressions beyond {args.threshold:.0%} against {args.compare}")
+            return
+        for name, field, old, new in found:
+            print(f"REGRESSION {name} {field}: {old:.2f} -> {new:.2f}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""Prompt size per action: the indented source templates against the compacted registry.
+
+Token counts use the same rough estimate as the document chunker (about 4
+characters per token), so they track the billed prompt tokens without
+needing the model's tokenizer. Also shows each action's temperature and
+max_tokens cap, and how a long question is cut to QUESTION_TOKEN_BUDGET.
+
+Usage: python benchmarks/bench_prompts.py [--question TEXT]
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import prompts  # noqa: E402
+from documents import estimate_tokens  # noqa: E402
+
+# The source template behind each registry entry, as it was sent before compaction
+SOURCES = {
+    'solve': prompts.SOLVE_PROMPT,
+    'explain': prompts.EXPLAIN_PROMPT,
+    'alternative_methods': prompts.ALTERNATIVE_METHODS_PROMPT,
+    'practice_similar': prompts.PRACTICE_SIMILAR_PROMPT,
+    'common_mistakes': prompts.COMMON_MISTAKES_PROMPT,
+    'real_world': prompts.REAL_WORLD_PROMPT,
+    'difficulty_ladder': prompts.DIFFICULTY_LADDER_PROMPT,
+    'tutor_mode': prompts.TUTOR_MODE_PROMPT,
+    'eli5': prompts.ELI5_PROMPT,
+    'concept_map': prompts.CONCEPT_MAP_PROMPT,
+    'difficulty_rating': prompts.DIFFICULTY_RATING_PROMPT,
+    'worksheet': prompts.WORKSHEET_PROMPT,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--question', default='Solve x^2 + 5x + 6 = 0')
+    args = parser.parse_args()
+
+    print(f"{'action':<22}{'source':>8}{'compact':>9}{'saved':>8}{'temp':>6}{'max_tokens':>12}")
+    total_source = total_compact = 0
+    for action, source in SOURCES.items():
+        before = estimate_tokens(source.format(question=args.question))
+        prompt = prompts.build_prompt(action, args.question)
+        total_source += before
+        total_compact += prompt.tokens
+        print(f"{action:<22}{before:>8}{prompt.tokens:>9}{1 - prompt.tokens / before:>8.0%}"
+              f"{prompt.temperature:>6}{prompt.max_tokens:>12}")
+    print(f"{'total':<22}{total_source:>8}{total_compact:>9}{1 - total_compact / total_source:>8.0%}")
+
+    long_question = ' '.join([args.question] * 2000)
+    prompt = prompts.build_prompt('solve', long_question)
+    print()
+    print(f"A {estimate_tokens(long_question)}-token question becomes a {prompt.tokens}-token solve prompt "
+          f"(budget {prompts.QUESTION_TOKEN_BUDGET}, truncated: {prompt.truncated})")
+
+
+if __name__ == '__main__':
+    main()
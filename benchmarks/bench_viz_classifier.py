@@ -0,0 +1,90 @@
+"""Accuracy and latency of the visualization classifier on the labelled corpus.
+
+Compares viz_classifier.classify with the rules analyze_for_visualization
+used before it, question only (no LLM answer). viz_corpus.jsonl was written
+alongside the classifier; viz_corpus_heldout.jsonl was written afterwards
+and never used to tune it, so its accuracy is the one to trust.
+
+Usage: python benchmarks/bench_viz_classifier.py [--repeat N] [--show-errors]
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from viz_classifier import classify  # noqa: E402
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CORPORA = (
+    ('development', os.path.join(HERE, 'viz_corpus.jsonl')),
+    ('held-out', os.path.join(HERE, 'viz_corpus_heldout.jsonl')),
+)
+
+
+def legacy_classify(question):
+    """The keyword and regex checks analyze_for_visualization ran before viz_classifier"""
+    question_lower = question.lower()
+    if re.search(r'x[\^²³⁴\*]|[xy]\s*=|f\(x\)|plot|graph|solve.*x', question_lower):
+        return 'function'
+    if any(word in question_lower for word in ['circle', 'square', 'triangle', 'rectangle', 'area', 'perimeter']):
+        return 'geometric'
+    numbers = re.findall(r'\d+', question)
+    if len(numbers) >= 3:
+        if 'mean' in question_lower or 'average' in question_lower or 'distribution' in question_lower:
+            return 'statistical'
+        return 'data'
+    return 'none'
+
+
+def load_corpus(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def evaluate(name, func, corpus, repeat, show_errors):
+    errors = [(item, func(item['question'])) for item in corpus]
+    errors = [(item, predicted) for item, predicted in errors if predicted != item['viz_type']]
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for item in corpus:
+            func(item['question'])
+    per_call = (time.perf_counter() - start) / (repeat * len(corpus)) * 1e6
+
+    accuracy = 100 * (len(corpus) - len(errors)) / len(corpus)
+    print(f"{name:<12}{accuracy:>10.1f}%{per_call:>14.1f}")
+    if show_errors:
+        for item, predicted in errors:
+            print(f"    {item['viz_type']:>11} -> {predicted:<11} {item['question']}")
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--show-errors', action='store_true')
+    args = parser.parse_args()
+
+    for name, path in CORPORA:
+        corpus = load_corpus(path)
+        print(f"{name} corpus: {len(corpus)} labelled questions")
+        print(f"{'classifier':<12}{'accuracy':>11}{'us/question':>14}")
+        evaluate('legacy', legacy_classify, corpus, args.repeat, args.show_errors)
+        errors = evaluate('classify', lambda question: classify(question).viz_type, corpus, args.repeat, args.show_errors)
+
+        by_type = {}
+        for item in corpus:
+            total, wrong = by_type.get(item['viz_type'], (0, 0))
+            by_type[item['viz_type']] = (total + 1, wrong + any(error is item for error, _ in errors))
+        print()
+        print(f"{'type':<12}{'questions':>10}{'correct':>10}")
+        for viz_type, (total, wrong) in sorted(by_type.items()):
+            print(f"{viz_type:<12}{total:>10}{total - wrong:>10}")
+        print()
+
+if __name__ == '__main__':
+    main()
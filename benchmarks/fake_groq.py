@@ -0,0 +1,175 @@
+"""Local stand-in for Groq's OpenAI-compatible chat-completions endpoint.
+
+Point the app at it with GROQ_BASE_URL=http://127.0.0.1:<port>. Run it on
+its own with: python benchmarks/fake_groq.py --port 8765 --latency 0.5
+
+Every completion waits latency seconds before its first token, then one
+second per token_rate reply tokens. A fraction error_rate of requests fail
+with error_status instead. stream=True requests get server-sent events, one
+chunk per word, with usage under x_groq on the last chunk as Groq sends it.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+COMPLETIONS_PATH = '/openai/v1/chat/completions'
+DEFAULT_REPLY = 'The solutions are x = -2 and x = -3.'
+
+
+class FakeGroqServer(ThreadingHTTPServer):
+    """Threaded HTTP server that answers chat completions with a configurable delay and error rate"""
+
+    daemon_threads = True
+
+    def __init__(self, address=('127.0.0.1', 0), latency=0.0, reply=DEFAULT_REPLY,
+                 token_rate=0.0, error_rate=0.0, error_status=503, seed=0):
+        super().__init__(address, FakeGroqHandler)
+        self.latency = latency
+        self.reply = reply
+        self.token_rate = token_rate
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.connections = 0
+        self.requests = 0
+        self.errors = 0
+        self.streams = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def count(self, field):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def should_fail(self):
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+    def token_delay(self, tokens):
+        """Seconds to generate tokens at token_rate (0 means instantly)"""
+        return tokens / self.token_rate if self.token_rate > 0 else 0.0
+
+    def start(self):
+        """Serve from a daemon thread and return self"""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class FakeGroqHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.server.count('connections')
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length) or b'{}')
+        self.server.count('requests')
+
+        if self.path != COMPLETIONS_PATH:
+            self.send_json(404, {'error': {'message': 'not found'}})
+            return
+
+        if self.server.should_fail():
+            self.server.count('errors')
+            self.send_json(self.server.error_status, {'error': {'message': 'fake upstream error'}})
+            return
+
+        time.sleep(self.server.latency)
+        prompt = body.get('messages', [{}])[-1].get('content', '')
+        words = self.server.reply.split()
+        usage = {
+            'prompt_tokens': len(prompt.split()),
+            'completion_tokens': len(words),
+            'total_tokens': len(prompt.split()) + len(words)
+        }
+        if body.get('stream'):
+            self.server.count('streams')
+            self.send_stream(body.get('model', ''), words, usage)
+            return
+
+        time.sleep(self.server.token_delay(len(words)))
+        self.send_json(200, {
+            'id': 'chatcmpl-fake',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': body.get('model', ''),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': self.server.reply},
+                'finish_reason': 'stop'
+            }],
+            'usage': usage
+        })
+
+    def send_stream(self, model, words, usage):
+        """Send the reply as chat.completion.chunk events, one word at a time"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        def event(delta, finish_reason=None, **extra):
+            chunk = {
+                'id': 'chatcmpl-fake',
+                'object': 'chat.completion.chunk',
+                'created': int(time.time()),
+                'model': model,
+                'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}]
+            }
+            chunk.update(extra)
+            self.write_chunk(f'data: {json.dumps(chunk)}\n\n')
+
+        event({'role': 'assistant', 'content': ''})
+        for index, word in enumerate(words):
+            time.sleep(self.server.token_delay(1))
+            event({'content': word if index == 0 else ' ' + word})
+        event({}, 'stop', x_groq={'id': 'req-fake', 'usage': usage})
+        self.write_chunk('data: [DONE]\n\n')
+        self.wfile.write(b'0\r\n\r\n')
+
+    def write_chunk(self, text):
+        data = text.encode('utf-8')
+        self.wfile.write(f'{len(data):x}\r\n'.encode('ascii') + data + b'\r\n')
+
+    def send_json(self, status, payload):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.5, help='seconds before the first token')
+    parser.add_argument('--token-rate', type=float, default=0.0, help='reply tokens per second (0: instant)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests that fail')
+    parser.add_argument('--error-status', type=int, default=503)
+    parser.add_argument('--reply', default=DEFAULT_REPLY)
+    args = parser.parse_args()
+
+    server = FakeGroqServer(
+        ('127.0.0.1', args.port), latency=args.latency, reply=args.reply,
+        token_rate=args.token_rate, error_rate=args.error_rate, error_status=args.error_status
+    )
+    print(f'Fake Groq listening on {server.base_url}')
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
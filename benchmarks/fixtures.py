@@ -0,0 +1,121 @@
+"""Synthetic PDF, DOCX and PPTX uploads for the load test.
+
+Each document mixes prose with numbered math questions, roughly the way a
+worksheet does, so the math detector and chunker have real work to do. The
+content is deterministic for a given size and seed; change the seed to get
+a document the upload cache hasn't seen.
+"""
+import io
+import random
+
+from docx import Document
+from pptx import Presentation
+from pptx.util import Inches
+
+PROSE = [
+    'Read each question carefully before you start.',
+    'Show all of your working in the space provided.',
+    'Calculators may be used unless the question says otherwise.',
+    'This section revises the material covered in the last unit.',
+    'Remember to give units where they are needed.',
+]
+
+QUESTIONS = [
+    'Solve {a}x + {b} = {c}',
+    'Solve x^2 - {s}x + {p} = 0',
+    'Find the derivative of x^{a} + {b}x^2',
+    'Integrate {a}x^2 + {b} with respect to x',
+    'Find the area of a circle with radius {a} cm',
+    'Find the mean of {a}, {b}, {c}, {s} and {p}',
+    'Simplify ({a}x + {b})({a}x - {b})',
+    'A train travels {c} km in {a} hours. What is its average speed?',
+]
+
+
+def page_lines(page, lines_per_page, rng):
+    """Lines for one page: a heading, then prose and questions mixed"""
+    lines = [f'Worksheet page {page}']
+    for number in range(1, lines_per_page):
+        if rng.random() < 0.3:
+            lines.append(rng.choice(PROSE))
+            continue
+        a, b, c = rng.randint(2, 9), rng.randint(1, 20), rng.randint(10, 99)
+        s, p = rng.randint(2, 12), rng.randint(1, 30)
+        lines.append(f'{number}. ' + rng.choice(QUESTIONS).format(a=a, b=b, c=c, s=s, p=p))
+    return lines
+
+
+def pages(count, lines_per_page=12, seed=0):
+    rng = random.Random(seed)
+    return [page_lines(page, lines_per_page, rng) for page in range(1, count + 1)]
+
+
+def _pdf_string(text):
+    escaped = text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+    return b'(' + escaped.encode('latin-1', 'replace') + b')'
+
+
+def make_pdf(count=10, lines_per_page=12, seed=0):
+    """A minimal multi-page PDF with one Helvetica text block per page"""
+    objects = [b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>', None]
+    font_id, pages_id = 1, 2
+    kids = []
+    for lines in pages(count, lines_per_page, seed):
+        text = b' '.join(_pdf_string(line) + b' Tj T*' for line in lines)
+        stream = b'BT /F1 11 Tf 72 740 Td 16 TL ' + text + b' ET'
+        objects.append(b'<< /Length %d >>\nstream\n%s\nendstream' % (len(stream), stream))
+        objects.append(
+            b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 792] /Contents %d 0 R '
+            b'/Resources << /Font << /F1 %d 0 R >> >> >>' % (pages_id, len(objects), font_id)
+        )
+        kids.append(len(objects))
+    objects[pages_id - 1] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (
+        b' '.join(b'%d 0 R' % kid for kid in kids), len(kids)
+    )
+    objects.append(b'<< /Type /Catalog /Pages %d 0 R >>' % pages_id)
+
+    out = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b'%d 0 obj\n%s\nendobj\n' % (number, body)
+    xref = len(out)
+    out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    out += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    out += b'trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, len(objects), xref)
+    return bytes(out)
+
+
+def make_docx(count=10, lines_per_page=12, seed=0):
+    """A Word document with one heading and paragraph block per page"""
+    document = Document()
+    for lines in pages(count, lines_per_page, seed):
+        document.add_heading(lines[0], level=2)
+        for line in lines[1:]:
+            document.add_paragraph(line)
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+def make_pptx(count=10, lines_per_page=12, seed=0):
+    """A slide deck with one slide per page: a title and a text box of lines"""
+    presentation = Presentation()
+    layout = presentation.slide_layouts[5]
+    for lines in pages(count, lines_per_page, seed):
+        slide = presentation.slides.add_slide(layout)
+        slide.shapes.title.text = lines[0]
+        frame = slide.shapes.add_textbox(Inches(0.5), Inches(1.5), Inches(9), Inches(5)).text_frame
+        frame.text = lines[1]
+        for line in lines[2:]:
+            frame.add_paragraph().text = line
+    buffer = io.BytesIO()
+    presentation.save(buffer)
+    return buffer.getvalue()
+
+
+BUILDERS = {
+    'pdf': make_pdf,
+    'docx': make_docx,
+    'pptx': make_pptx,
+}
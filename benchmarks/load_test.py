@@ -0,0 +1,258 @@
+"""Offline load test: every /solve action and document uploads against a fake Groq.
+
+Starts the fake Groq server and gunicorn with the repo config, then sends a
+fixed number of requests at a fixed concurrency, round-robin over the
+scenarios: the twelve /solve actions and one /upload_and_extract per
+fixture type. Questions and documents vary per request so neither the LLM
+cache nor the upload cache turns the run into a cache benchmark.
+
+Reports p50/p95/p99 latency, throughput and response bytes per scenario,
+the CPU seconds gunicorn's workers used while under load (Linux only, read
+from /proc), and the per-stage means from the app's /metrics.
+
+Usage: python benchmarks/load_test.py [--requests N] [--concurrency N]
+       [--latency S] [--token-rate T] [--error-rate F] [--pages N]
+       [--actions a,b,...] [--uploads pdf,docx,pptx] [--json results.json]
+"""
+import argparse
+import itertools
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_concurrency import start_gunicorn  # noqa: E402
+from fake_groq import FakeGroqServer  # noqa: E402
+from fixtures import BUILDERS  # noqa: E402
+from prompts import PROMPTS  # noqa: E402
+
+QUESTIONS = [
+    'Solve {a}x + {b} = {c}',
+    'Solve x^2 - {s}x + {p} = 0',
+    'Find the derivative of x^{a} + {b}x',
+    'Plot y = x^2 - {b}',
+    'What is the area of a circle with radius {a}?',
+    'Find the mean of {a}, {b}, {c}, {s} and {p}',
+    'A car travels {c} km in {a} hours. What is its average speed?',
+]
+
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+
+
+def question(index):
+    """A different question for every request index"""
+    a, b, c = index % 7 + 2, index % 19 + 1, index + 10
+    s, p = index % 11 + 2, index % 29 + 1
+    return QUESTIONS[index % len(QUESTIONS)].format(a=a, b=b, c=c, s=s, p=p)
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not values:
+        return 0.0
+    rank = max(0, min(len(values) - 1, round(fraction * len(values) + 0.5) - 1))
+    return values[rank]
+
+
+def process_cpu_seconds(root_pid):
+    """User + system CPU of a process and its direct children, or None without /proc"""
+    if not os.path.isdir('/proc'):
+        return None
+    total = 0
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # The command name can contain spaces, so split after its closing paren
+                fields = f.read().rsplit(')', 1)[1].split()
+        except OSError:
+            continue
+        if int(entry) == root_pid or int(fields[1]) == root_pid:
+            total += int(fields[11]) + int(fields[12])
+    return total / CLOCK_TICKS
+
+
+class Scenario:
+    """One kind of request: how to send it, plus the latencies and sizes it recorded"""
+
+    def __init__(self, name, send):
+        self.name = name
+        self.send = send
+        self.latencies = []
+        self.bytes = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def run(self, client, index):
+        start = time.perf_counter()
+        try:
+            response = self.send(client, index)
+            failed = response.status_code != 200 or 'error' in response.json()
+            size = len(response.content)
+        except (httpx.HTTPError, ValueError):
+            failed, size = True, 0
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.latencies.append(elapsed)
+            self.bytes += size
+            self.errors += failed
+
+    def summary(self):
+        latencies = sorted(self.latencies)
+        count = len(latencies)
+        return {
+            'scenario': self.name,
+            'requests': count,
+            'errors': self.errors,
+            'p50_ms': percentile(latencies, 0.50) * 1000,
+            'p95_ms': percentile(latencies, 0.95) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000,
+            'mean_bytes': self.bytes / count if count else 0,
+        }
+
+
+def solve_scenario(action):
+    def send(client, index):
+        return client.post('/solve', data={'question': question(index), 'action': action})
+    return Scenario(action, send)
+
+
+def upload_scenario(file_type, pages, count):
+    # One distinct document per request, built up front so building isn't timed
+    documents = [BUILDERS[file_type](pages, seed=seed) for seed in range(count)]
+    sent = itertools.count()
+
+    def send(client, index):
+        data = documents[next(sent) % count]
+        files = {'file': (f'worksheet-{index}.{file_type}', data)}
+        return client.post('/upload_and_extract', files=files)
+    return Scenario(f'upload_{file_type}', send)
+
+
+def stage_means(metrics_text):
+    """Mean seconds per stage from the app's Prometheus text, summed over actions"""
+    sums, counts = {}, {}
+    pattern = re.compile(r'^mathsolver_stage_duration_seconds_(sum|count)\{(.*)\} (\S+)$')
+    for line in metrics_text.splitlines():
+        match = pattern.match(line)
+        if not match:
+            continue
+        stage = re.search(r'stage="([^"]*)"', match.group(2)).group(1)
+        target = sums if match.group(1) == 'sum' else counts
+        target[stage] = target.get(stage, 0) + float(match.group(3))
+    return {stage: (sums[stage] / counts[stage], int(counts[stage])) for stage in sums if counts.get(stage)}
+
+
+def run(args, scenarios, groq):
+    metrics_dir = tempfile.mkdtemp(prefix='mathsolver-metrics-')
+    process, base_url = start_gunicorn(
+        'gthread', args.workers, args.threads, groq.base_url,
+        UPLOAD_CACHE_PATH='', METRICS_DIR=metrics_dir
+    )
+    try:
+        with httpx.Client(base_url=base_url, timeout=120) as login:
+            login.post('/', data={'api_key': 'gsk_benchmark'})
+            cookies = dict(login.cookies)
+
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        with httpx.Client(base_url=base_url, cookies=cookies, timeout=300, limits=limits) as client:
+            # One warm-up pass so lazy imports and first-call caches aren't in the numbers
+            for index, scenario in enumerate(scenarios):
+                scenario.send(client, 10_000 + index)
+
+            cpu_before = process_cpu_seconds(process.pid)
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+                list(pool.map(
+                    lambda index: scenarios[index % len(scenarios)].run(client, index),
+                    range(args.requests)
+                ))
+            elapsed = time.perf_counter() - start
+            cpu_after = process_cpu_seconds(process.pid)
+            metrics_text = client.get('/metrics').text
+    finally:
+        process.terminate()
+        process.wait()
+
+    cpu = cpu_after - cpu_before if cpu_before is not None and cpu_after is not None else None
+    return elapsed, cpu, stage_means(metrics_text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=300)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=64)
+    parser.add_argument('--latency', type=float, default=0.2, help='fake Groq seconds before the first token')
+    parser.add_argument('--token-rate', type=float, default=0.0, help='fake Groq reply tokens per second')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of fake Groq requests that fail')
+    parser.add_argument('--pages', type=int, default=10, help='pages per uploaded document')
+    parser.add_argument('--actions', default=','.join(PROMPTS), help='comma-separated /solve actions')
+    parser.add_argument('--uploads', default=','.join(BUILDERS), help="comma-separated file types, '' for none")
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    actions = [action for action in args.actions.split(',') if action]
+    file_types = [file_type for file_type in args.uploads.split(',') if file_type]
+    # Enough documents for the warm-up plus each upload scenario's share of the requests
+    per_scenario = -(-args.requests // (len(actions) + len(file_types))) + 1
+    scenarios = [solve_scenario(action) for action in actions]
+    scenarios += [upload_scenario(file_type, args.pages, per_scenario) for file_type in file_types]
+
+    groq = FakeGroqServer(latency=args.latency, token_rate=args.token_rate, error_rate=args.error_rate).start()
+    elapsed, cpu, stages = run(args, scenarios, groq)
+    groq.shutdown()
+
+    rows = [scenario.summary() for scenario in scenarios]
+    print(f"{'scenario':<22}{'n':>6}{'err':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'bytes':>10}")
+    for row in rows:
+        print(f"{row['scenario']:<22}{row['requests']:>6}{row['errors']:>6}{row['p50_ms']:>10.1f}"
+              f"{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}{row['mean_bytes']:>10.0f}")
+
+    latencies = sorted(latency for scenario in scenarios for latency in scenario.latencies)
+    total_bytes = sum(scenario.bytes for scenario in scenarios)
+    overall = {
+        'requests': len(latencies),
+        'errors': sum(scenario.errors for scenario in scenarios),
+        'seconds': elapsed,
+        'requests_per_second': len(latencies) / elapsed,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'response_bytes': total_bytes,
+        'worker_cpu_seconds': cpu,
+        'groq_requests': groq.requests,
+        'groq_errors': groq.errors,
+    }
+    print()
+    print(f"{overall['requests']} requests in {elapsed:.2f}s: {overall['requests_per_second']:.1f} req/s, "
+          f"p50 {overall['p50_ms']:.1f} ms, p95 {overall['p95_ms']:.1f} ms, p99 {overall['p99_ms']:.1f} ms")
+    print(f"{total_bytes / 1e6:.2f} MB returned, {overall['errors']} errors, "
+          f"{groq.requests} Groq requests ({groq.errors} failed)")
+    if cpu is not None:
+        print(f"worker CPU {cpu:.2f}s ({cpu * 1000 / len(latencies):.1f} ms per request)")
+
+    if stages:
+        print()
+        print(f"{'stage':<16}{'count':>8}{'mean ms':>10}")
+        for stage, (mean, count) in sorted(stages.items(), key=lambda item: -item[1][0]):
+            print(f"{stage:<16}{count:>8}{mean * 1000:>10.2f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'overall': overall, 'scenarios': rows,
+                       'stages': {stage: mean for stage, (mean, _) in stages.items()}}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
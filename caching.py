@@ -0,0 +1,196 @@
+"""Caches shared by the request handlers.
+
+LRUCache is a per-process, in-memory tier. DiskCache is an SQLite file that
+every gunicorn worker shares and that survives restarts. TieredCache puts the
+two together. All of them are safe to use from several threads.
+"""
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def cache_key(*parts):
+    """Hash the given JSON-serializable parts into a stable cache key"""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def normalize_question(question):
+    """Collapse whitespace so trivially different spellings share a cache entry"""
+    return ' '.join(str(question).split())
+
+
+class LRUCache:
+    """Bounded in-memory LRU cache with an optional TTL (in seconds)"""
+
+    def __init__(self, maxsize=256, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.time():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        expires_at = time.time() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._data)}
+
+
+class DiskCache:
+    """SQLite-backed cache shared between worker processes.
+
+    Values are pickled. Entries expire after ttl seconds and the least
+    recently used ones are evicted once max_entries, or the optional
+    max_bytes total of pickled value sizes, is exceeded.
+    """
+
+    def __init__(self, path, max_entries=10000, ttl=None, max_bytes=None):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                ' key TEXT PRIMARY KEY,'
+                ' value BLOB NOT NULL,'
+                ' expires_at REAL,'
+                ' accessed_at REAL NOT NULL,'
+                ' size INTEGER NOT NULL DEFAULT 0)'
+            )
+            columns = [row[1] for row in conn.execute('PRAGMA table_info(cache)')]
+            if 'size' not in columns:
+                # Cache files created before size tracking existed
+                conn.execute('ALTER TABLE cache ADD COLUMN size INTEGER NOT NULL DEFAULT 0')
+            conn.execute('CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed_at)')
+
+    def _connect(self):
+        # A connection per call keeps this safe across threads and forked workers
+        return sqlite3.connect(self.path, timeout=5)
+
+    def get(self, key, default=None):
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute('SELECT value, expires_at FROM cache WHERE key = ?', (key,)).fetchone()
+            if row is not None and (row[1] is None or row[1] > now):
+                conn.execute('UPDATE cache SET accessed_at = ? WHERE key = ?', (now, key))
+                self.hits += 1
+                return pickle.loads(row[0])
+            if row is not None:
+                conn.execute('DELETE FROM cache WHERE key = ?', (key,))
+        self.misses += 1
+        return default
+
+    def set(self, key, value):
+        now = time.time()
+        expires_at = now + self.ttl if self.ttl else None
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO cache (key, value, expires_at, accessed_at, size) VALUES (?, ?, ?, ?, ?)',
+                (key, blob, expires_at, now, len(blob))
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        conn.execute('DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at <= ?', (now,))
+        (count,) = conn.execute('SELECT COUNT(*) FROM cache').fetchone()
+        if count > self.max_entries:
+            conn.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed_at LIMIT ?)',
+                (count - self.max_entries,)
+            )
+        if self.max_bytes is not None:
+            # Drop least recently used entries until the running total fits
+            conn.execute(
+                'DELETE FROM cache WHERE key IN ('
+                ' SELECT key FROM ('
+                '  SELECT key, SUM(size) OVER (ORDER BY accessed_at DESC, key) AS running FROM cache'
+                ' ) WHERE running > ?)',
+                (self.max_bytes,)
+            )
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM cache')
+
+    def __len__(self):
+        with self._connect() as conn:
+            return conn.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+
+    def total_bytes(self):
+        with self._connect() as conn:
+            return conn.execute('SELECT COALESCE(SUM(size), 0) FROM cache').fetchone()[0]
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self), 'bytes': self.total_bytes()}
+
+
+class TieredCache:
+    """Memory LRU in front of an optional disk tier; disk hits are promoted to memory"""
+
+    def __init__(self, memory, disk=None):
+        self.memory = memory
+        self.disk = disk
+
+    def get(self, key, default=None):
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+        return default if value is None else value
+
+    def set(self, key, value):
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self):
+        stats = {'memory': self.memory.stats()}
+        if self.disk is not None:
+            stats['disk'] = self.disk.stats()
+        return stats
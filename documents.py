@@ -0,0 +1,163 @@
+"""Streaming text extraction for uploaded documents.
+
+Readers are generators that yield one page, slide or paragraph at a time, so
+the caller decides how much text to keep in memory. Large PDFs are split
+across a process pool, because PyPDF2 text extraction is pure-Python and
+CPU-bound. chunk_segments packs those segments into LLM-sized chunks.
+"""
+import hashlib
+import io
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pptx
+from docx import Document
+from PyPDF2 import PdfReader
+
+# Below this many pages the cost of shipping the file to worker processes isn't worth it
+PDF_PARALLEL_MIN_PAGES = 16
+PDF_MIN_PAGES_PER_TASK = 4
+
+# Roughly one segment in this many closes a chunk early (see chunk_segments)
+CHUNK_ANCHOR_EVERY = 4
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def _process_pool(workers):
+    """Return the shared extraction pool, (re)building it for the requested size"""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            # forkserver avoids forking a multi-threaded gunicorn worker
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method))
+            _pool_workers = workers
+        return _pool
+
+
+def _extract_page(page):
+    start = time.perf_counter()
+    text = page.extract_text() or ''
+    return text, time.perf_counter() - start
+
+
+def extract_pdf_page_range(data, start, stop):
+    """Extract pages [start, stop) of a PDF given as bytes; runs in a worker process"""
+    reader = PdfReader(io.BytesIO(data))
+    pages = []
+    for index in range(start, stop):
+        text, seconds = _extract_page(reader.pages[index])
+        pages.append((index + 1, text, seconds))
+    return pages
+
+
+def iter_pdf_pages(file, workers=1):
+    """Yield (page_number, text, seconds) for every page of a PDF, in order.
+
+    With more than one worker and a long enough document, page ranges are
+    extracted in a process pool. Only a few ranges are in flight at a time,
+    so memory stays bounded however long the document is.
+    """
+    data = file.read()
+    reader = PdfReader(io.BytesIO(data))
+    page_count = len(reader.pages)
+
+    if workers <= 1 or page_count < PDF_PARALLEL_MIN_PAGES:
+        for index, page in enumerate(reader.pages):
+            text, seconds = _extract_page(page)
+            yield index + 1, text, seconds
+        return
+
+    pool = _process_pool(workers)
+    per_task = max(PDF_MIN_PAGES_PER_TASK, page_count // (workers * 4))
+    ranges = deque((start, min(start + per_task, page_count)) for start in range(0, page_count, per_task))
+    in_flight = deque()
+
+    while ranges or in_flight:
+        while ranges and len(in_flight) < workers * 2:
+            start, stop = ranges.popleft()
+            in_flight.append(pool.submit(extract_pdf_page_range, data, start, stop))
+        for page in in_flight.popleft().result():
+            yield page
+
+
+def iter_docx_paragraphs(file):
+    """Yield the non-empty paragraphs of a Word document"""
+    for paragraph in Document(file).paragraphs:
+        if paragraph.text.strip():
+            yield paragraph.text
+
+
+def iter_pptx_slides(file):
+    """Yield the text of each slide of a PowerPoint deck"""
+    for slide in pptx.Presentation(file).slides:
+        text = "\n".join(shape.text for shape in slide.shapes if hasattr(shape, "text"))
+        if text.strip():
+            yield text
+
+
+def estimate_tokens(text):
+    """Rough token count for LLaMA-style tokenizers (about 4 characters per token)"""
+    return len(text) // 4 + 1
+
+
+def _split_oversized(segment, token_budget):
+    """Split a segment that alone exceeds the budget on line boundaries, then hard-wrap"""
+    if estimate_tokens(segment) <= token_budget:
+        yield segment
+        return
+
+    max_chars = token_budget * 4
+    piece = []
+    size = 0
+    for line in segment.split("\n"):
+        while len(line) > max_chars:
+            yield line[:max_chars]
+            line = line[max_chars:]
+        if piece and size + len(line) > max_chars:
+            yield "\n".join(piece)
+            piece, size = [], 0
+        piece.append(line)
+        size += len(line) + 1
+    if piece:
+        yield "\n".join(piece)
+
+
+def _is_anchor(piece):
+    """Content-defined boundary: about one segment in CHUNK_ANCHOR_EVERY ends a chunk early"""
+    digest = hashlib.sha1(piece.encode('utf-8')).digest()
+    return int.from_bytes(digest[:4], 'big') % CHUNK_ANCHOR_EVERY == 0
+
+
+def chunk_segments(segments, token_budget):
+    """Group pages/slides/paragraphs into chunks of at most token_budget tokens.
+
+    Segments are never split unless one alone is over budget, and chunks are
+    yielded as soon as they fill, so the whole document is never in memory.
+    Once a chunk is a third full it also closes after an anchor segment chosen by
+    content hash, so editing one page only changes the chunks around it and
+    the rest of a re-uploaded document still hits the cache.
+    """
+    chunk = []
+    used = 0
+    for segment in segments:
+        for piece in _split_oversized(segment, token_budget):
+            cost = estimate_tokens(piece)
+            if chunk and used + cost > token_budget:
+                yield "\n\n".join(chunk)
+                chunk, used = [], 0
+            chunk.append(piece)
+            used += cost
+            if used >= token_budget // 3 and _is_anchor(piece):
+                yield "\n\n".join(chunk)
+                chunk, used = [], 0
+    if chunk:
+        yield "\n\n".join(chunk)
@@ -0,0 +1,138 @@
+"""Helpers for turning user-typed math into something SymPy can parse.
+
+clean_expression rewrites notation with one str.translate pass and a few
+precompiled regexes. parse_expression and compile_expression memoize the
+slow steps, sympify and lambdify, by the raw text; text that fails to parse
+is cached as None so it isn't retried on every request. Text is parsed
+unevaluated first so a power tower like 9^9^9 is rejected before SymPy
+tries to compute it, and results that are undefined (x/0) are rejected too.
+"""
+import os
+import re
+from functools import lru_cache
+
+import sympy as sp
+
+PARSE_CACHE_SIZE = int(os.environ.get('PARSE_CACHE_SIZE', 2048))
+
+OPERATORS = str.maketrans({
+    '²': '**2', '³': '**3', '⁴': '**4', '⁵': '**5',
+    '^': '**', '×': '*', '·': '*', '÷': '/', '−': '-', 'π': '(pi)',
+})
+
+# Names that take an argument list, so "sin(x)" is a call but "x(x+1)" is a product
+FUNCTION_NAMES = frozenset({
+    'sin', 'cos', 'tan', 'cot', 'sec', 'csc', 'asin', 'acos', 'atan', 'atan2',
+    'sinh', 'cosh', 'tanh', 'asinh', 'acosh', 'atanh', 'exp', 'log', 'ln',
+    'sqrt', 'cbrt', 'root', 'abs', 'Abs', 'sign', 'floor', 'ceiling', 'factorial',
+    'gamma', 'Min', 'Max', 'f', 'g', 'h',
+})
+
+# Largest numeric exponent we let SymPy evaluate; 9^9^9 would run for minutes
+MAX_EXPONENT = 1000
+
+# Values SymPy produces for division by zero and the like; never a usable answer
+UNDEFINED = (sp.zoo, sp.nan, sp.oo, -sp.oo)
+
+# The only multi-letter names allowed in plain math; anything else is words or code
+PLAIN_FUNCTIONS = frozenset({'sin', 'cos', 'tan', 'log', 'ln', 'exp', 'sqrt', 'pi', 'e', 'abs'})
+SAFE_EXPRESSION = re.compile(r'^[\w\s+\-*/^().²³⁴⁵√×÷π]+$')
+IDENTIFIER = re.compile(r'[a-zA-Z_]+')
+
+# Values for names users type that SymPy would otherwise read as plain symbols
+LOCALS = {'e': sp.E, 'ln': sp.log, 'abs': sp.Abs}
+
+SQRT_ATOM = re.compile(r'√\s*(\d+(?:\.\d+)?|[a-zA-Z]\w*)')
+NUMBER_THEN_NAME = re.compile(r'(?<![a-zA-Z_\d.])(\d+(?:\.\d+)?)(?=[a-zA-Z(])')
+CLOSE_THEN_OPERAND = re.compile(r'\)(?=\s*[\w(])')
+NAME_THEN_PAREN = re.compile(r'\b([a-zA-Z_]\w*)(?=\s*\()')
+
+
+def _multiply_unless_function(match):
+    name = match.group(1)
+    return name if name in FUNCTION_NAMES else name + '*'
+
+
+def clean_expression(expr):
+    """Convert common math notation to Python syntax, including implicit multiplication"""
+    expr = str(expr).translate(OPERATORS)
+    expr = SQRT_ATOM.sub(r'sqrt(\1)', expr).replace('√', 'sqrt')
+    expr = NUMBER_THEN_NAME.sub(r'\1*', expr)
+    expr = CLOSE_THEN_OPERAND.sub(')*', expr)
+    expr = NAME_THEN_PAREN.sub(_multiply_unless_function, expr)
+    return expr
+
+
+def is_plain_math(text):
+    """True if text only uses math characters, one-letter variables and PLAIN_FUNCTIONS"""
+    if not text.strip() or not SAFE_EXPRESSION.match(text):
+        return False
+    return all(len(name) == 1 or name in PLAIN_FUNCTIONS for name in IDENTIFIER.findall(clean_expression(text)))
+
+
+def has_huge_power(expr):
+    """True if an unevaluated expression raises anything to a numeric power above MAX_EXPONENT"""
+    # Post-order, so an exponent's own powers are checked before its value is estimated
+    for node in sp.postorder_traversal(expr):
+        if isinstance(node, sp.Pow) and node.exp.is_number and abs(sp.N(node.exp)) > MAX_EXPONENT:
+            return True
+    return False
+
+
+def estimate_degree(expr):
+    """Total degree of expr as if it were expanded, read off the unexpanded tree.
+
+    Functions count as degree 1 (or their argument's degree, if higher), so
+    sin(x)^7*cos(x)^5 is 12 and (x+1)^200*(x+2)^200 is 400, without paying
+    for the expansion that sp.Poly or sp.together would do.
+    """
+    if not expr.free_symbols:
+        return 0
+    if expr.is_Symbol:
+        return 1
+    if expr.is_Add:
+        return max(estimate_degree(arg) for arg in expr.args)
+    if expr.is_Mul:
+        return sum(estimate_degree(arg) for arg in expr.args)
+    if expr.is_Pow and expr.exp.is_Number:
+        return estimate_degree(expr.base) * abs(float(expr.exp))
+    return max([1] + [estimate_degree(arg) for arg in expr.args])
+
+
+def is_undefined(expr):
+    """True if expr is or contains zoo, nan or ±oo"""
+    return isinstance(expr, sp.Basic) and expr.has(*UNDEFINED)
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_expression(text):
+    """Parse user-typed math into a SymPy object, or None if it doesn't parse or is too big"""
+    try:
+        code = clean_expression(text)
+        if has_huge_power(sp.sympify(code, locals=LOCALS, evaluate=False)):
+            return None
+        # rational=True keeps decimals exact, so 0.5x = 2 solves to 4, not 4.00000000000000
+        expr = sp.sympify(code, locals=LOCALS, rational=True)
+    except Exception:
+        return None
+    return None if is_undefined(expr) else expr
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def compile_expression(text, variable='x'):
+    """Return (expr, func) for text, where func evaluates expr on NumPy arrays.
+
+    expr is None if the text doesn't parse. func is None if the expression
+    has other free symbols or NumPy can't evaluate it, in which case callers
+    fall back to SymPy substitution.
+    """
+    expr = parse_expression(text)
+    if not isinstance(expr, sp.Expr):
+        return None, None
+    x = sp.Symbol(variable)
+    if expr.free_symbols - {x}:
+        return expr, None
+    try:
+        return expr, sp.lambdify(x, expr, modules='numpy')
+    except Exception:
+        return expr, None
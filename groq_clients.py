@@ -0,0 +1,78 @@
+"""Per-process registry of Groq clients.
+
+Building a Groq client per request throws away its httpx connection pool, so
+every call pays for a fresh TCP + TLS handshake. ClientPool hands out one
+client per API key and every client shares a single keep-alive httpx pool.
+Keys are only stored hashed.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import httpx
+from groq import Groq
+
+
+class ClientPool:
+    """Bounded LRU of Groq clients keyed by hashed API key, with idle eviction"""
+
+    def __init__(self, max_clients=256, idle_timeout=900, max_connections=100,
+                 max_keepalive_connections=20, keepalive_expiry=60.0, timeout=60.0):
+        self.max_clients = max_clients
+        self.idle_timeout = idle_timeout
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self._clients = OrderedDict()
+        self._http_client = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _shared_http_client(self):
+        # Sockets must not be shared across a fork, so each worker builds its own pool
+        if self._http_client is None or self._pid != os.getpid():
+            self._http_client = httpx.Client(limits=self.limits, timeout=self.timeout, follow_redirects=True)
+            self._pid = os.getpid()
+            self._clients.clear()
+        return self._http_client
+
+    def _evict_idle(self, now):
+        while self._clients:
+            _, (_, last_used) = next(iter(self._clients.items()))
+            if now - last_used < self.idle_timeout and len(self._clients) <= self.max_clients:
+                break
+            self._clients.popitem(last=False)
+
+    def get(self, api_key):
+        """Return the pooled client for api_key, creating it on first use"""
+        key = hashlib.sha256(api_key.encode('utf-8')).hexdigest()
+        now = time.monotonic()
+        with self._lock:
+            http_client = self._shared_http_client()
+            entry = self._clients.pop(key, None)
+            if entry is None:
+                self.misses += 1
+                client = Groq(api_key=api_key, http_client=http_client)
+            else:
+                self.hits += 1
+                client = entry[0]
+            self._clients[key] = (client, now)
+            self._evict_idle(now)
+            return client
+
+    def close(self):
+        with self._lock:
+            self._clients.clear()
+            if self._http_client is not None:
+                self._http_client.close()
+                self._http_client = None
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._clients)}
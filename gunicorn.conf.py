@@ -0,0 +1,25 @@
+"""Gunicorn settings for the Flask app.
+
+Requests spend almost all of their time waiting on Groq, so each worker runs
+a pool of threads: while one thread waits on the network the others keep
+serving. Concurrency is roughly workers x threads instead of just workers.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', f"0.0.0.0:{os.environ.get('PORT', '8000')}")
+workers = int(os.environ.get('GUNICORN_WORKERS', min(multiprocessing.cpu_count() * 2 + 1, 4)))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('GUNICORN_THREADS', 64))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+
+def on_starting(server):
+    """Drop per-worker metrics files from a previous run so /metrics starts from zero"""
+    from metrics import clear_directory
+
+    default_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'metrics')
+    directory = os.environ.get('METRICS_DIR', default_dir)
+    if directory:
+        clear_directory(directory)
@@ -0,0 +1,169 @@
+"""Background jobs for work too slow to run inside a request.
+
+JobQueue runs jobs on a bounded thread pool inside the worker that accepted
+them and records their state in an SQLite table. Any gunicorn worker can
+then answer status and result requests. Finished jobs expire after ttl
+seconds. A job whose worker process died is reported as failed, not left
+running forever.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+FINISHED = (DONE, FAILED)
+
+
+class QueueFull(Exception):
+    """Raised by JobQueue.submit when max_pending jobs are already waiting or running"""
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class JobQueue:
+    """Bounded per-process job runner with a job table shared between processes"""
+
+    def __init__(self, path, workers=4, max_pending=32, ttl=3600):
+        self.path = path
+        self.workers = workers
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self._pending = 0
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS jobs ('
+                ' id TEXT PRIMARY KEY,'
+                ' kind TEXT NOT NULL,'
+                ' owner TEXT,'
+                ' status TEXT NOT NULL,'
+                ' done INTEGER NOT NULL DEFAULT 0,'
+                ' total INTEGER NOT NULL DEFAULT 0,'
+                ' result TEXT,'
+                ' error TEXT,'
+                ' pid INTEGER NOT NULL,'
+                ' created_at REAL NOT NULL,'
+                ' updated_at REAL NOT NULL,'
+                ' expires_at REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS jobs_expires ON jobs (expires_at)')
+
+    def _connect(self):
+        # A connection per call keeps this safe across threads and forked workers
+        return sqlite3.connect(self.path, timeout=5)
+
+    def _pool(self):
+        # Threads don't survive a fork, so each worker process starts its own pool
+        if self._executor is None or self._pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='job')
+            self._pid = os.getpid()
+            self._pending = 0
+        return self._executor
+
+    def submit(self, kind, func, *args, owner=None):
+        """Queue func(*args, on_progress) and return the new job id.
+
+        func must return a JSON-serializable result; on_progress(done, total)
+        may be called any number of times while it runs. Raises QueueFull
+        when this process already has max_pending unfinished jobs.
+        """
+        with self._lock:
+            pool = self._pool()
+            if self._pending >= self.max_pending:
+                raise QueueFull(f'{self._pending} jobs already pending')
+            self._pending += 1
+
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                self._expire(conn, now)
+                conn.execute(
+                    'INSERT INTO jobs (id, kind, owner, status, pid, created_at, updated_at, expires_at)'
+                    ' VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    (job_id, kind, owner, QUEUED, os.getpid(), now, now, now + self.ttl)
+                )
+            pool.submit(self._run, job_id, func, args)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            raise
+        return job_id
+
+    def _run(self, job_id, func, args):
+        def on_progress(done, total):
+            self._update(job_id, done=done, total=total)
+
+        try:
+            self._update(job_id, status=RUNNING)
+            result = func(*args, on_progress)
+            self._update(job_id, status=DONE, result=json.dumps(result))
+        except Exception as e:
+            print(f"Job {job_id} failed: {e}")
+            self._update(job_id, status=FAILED, error=f'Error: {str(e)}')
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _update(self, job_id, **fields):
+        now = time.time()
+        fields['updated_at'] = now
+        if fields.get('status') in FINISHED:
+            fields['expires_at'] = now + self.ttl
+        assignments = ', '.join(f'{name} = ?' for name in fields)
+        with self._connect() as conn:
+            conn.execute(f'UPDATE jobs SET {assignments} WHERE id = ?', (*fields.values(), job_id))
+
+    def _expire(self, conn, now):
+        conn.execute('DELETE FROM jobs WHERE expires_at <= ?', (now,))
+
+    def get(self, job_id, owner=None):
+        """Return the job as a dict, or None if it doesn't exist, has expired or belongs to someone else"""
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None or row['expires_at'] <= time.time() or row['owner'] != owner:
+            return None
+
+        job = {
+            'id': row['id'],
+            'kind': row['kind'],
+            'status': row['status'],
+            'progress': {'done': row['done'], 'total': row['total']},
+            'created_at': row['created_at'],
+            'updated_at': row['updated_at'],
+        }
+        if job['status'] not in FINISHED and not _process_alive(row['pid']):
+            self._update(job_id, status=FAILED, error='Error: job was interrupted by a server restart')
+            return self.get(job_id, owner)
+        if row['error']:
+            job['error'] = row['error']
+        if row['result'] is not None:
+            job['result'] = json.loads(row['result'])
+        return job
+
+    def stats(self):
+        with self._connect() as conn:
+            counts = dict(conn.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall())
+        return {'pending': self._pending, 'max_pending': self.max_pending, 'jobs': counts}
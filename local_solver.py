@@ -0,0 +1,288 @@
+"""Deterministic SymPy answers for simple, well-formed questions.
+
+solve_locally handles polynomial equations, derivatives, integrals,
+simplify/expand/factor, descriptive statistics of a number list and circle
+measurements. It only answers when the whole question matches one of these
+shapes and the expression uses plain math; otherwise it returns None and
+the caller asks the LLM.
+"""
+import re
+from collections import Counter
+from functools import lru_cache
+from math import comb, prod
+
+import sympy as sp
+
+from expressions import estimate_degree, is_plain_math, is_undefined, parse_expression
+
+# Highest degree we solve when the roots aren't all rational
+MAX_RADICAL_DEGREE = 2
+MAX_POLY_DEGREE = 6
+
+# SymPy's expand, factor, simplify and integrate have no time limit, so anything
+# past these estimates, made before calling them, goes to the LLM instead.
+# integrate('sin(x)^7*cos(x)^5*exp(x)') ran 168 s and expand('(x+y+z)^300') 47 s
+MAX_LOCAL_DEGREE = 20
+MAX_EXPANDED_TERMS = 40
+# Integrands with functions, roots or denominators are far slower than polynomials
+MAX_INTEGRAND_DEGREE = 3
+MAX_INTEGRAND_FUNCTIONS = 2
+# Longer answers aren't the quick exact answer the local solver is for
+MAX_ANSWER_LENGTH = 300
+
+ASK = r'(?:what\s+is|what\'s|find|calculate|compute|evaluate|determine|work\s+out)?\s*(?:the\s+)?'
+VARIABLE = r'(?:\s+(?:with\s+respect\s+to|wrt)\s+(?P<var>[a-z]))?'
+
+SOLVE = re.compile(
+    r'^(?:solve|find\s+the\s+(?:roots|solutions?)\s+of|find\s+[a-z]\s+(?:if|when|given))'
+    r'(?:\s+for\s+(?P<var>[a-z]))?\s*:?\s*(?P<expr>[^=]+=[^=]+?)(?:\s*,?\s*for\s+(?P<var2>[a-z]))?$',
+    re.IGNORECASE
+)
+DERIVATIVE = re.compile(
+    r'^(?:' + ASK + r'(?:first\s+)?derivative\s+of|differentiate|d/d(?P<dvar>[a-z]))\s*:?\s*'
+    r'(?:[fgy](?:\([a-z]\))?\s*=\s*)?(?P<expr>.+?)' + VARIABLE + r'$',
+    re.IGNORECASE
+)
+INTEGRAL = re.compile(
+    r'^(?:' + ASK + r'(?:indefinite\s+|definite\s+)?integral\s+of|integrate)\s*:?\s*'
+    r'(?P<expr>.+?)(?:\s*d(?P<dvar>[a-z]))?' + VARIABLE +
+    r'(?:\s+from\s+(?P<lower>-?[\w.]+)\s+to\s+(?P<upper>-?[\w.]+))?$',
+    re.IGNORECASE
+)
+TRANSFORM = re.compile(r'^(?P<op>simplify|expand|factori[sz]e|factor)\s*:?\s*(?P<expr>.+)$', re.IGNORECASE)
+STAT_NAMES = r'(?:mean|average|median|mode|range|sum)'
+STATISTICS = re.compile(
+    r'^' + ASK + r'(?P<stats>' + STAT_NAMES + r'(?:\s*(?:,|and|&)\s*(?:the\s+)?' + STAT_NAMES + r')*)'
+    r'\s+of\s*(?:the\s+(?:numbers|data|values|set))?\s*:?\s*(?P<numbers>-?\d[-\d.,\s]*(?:and\s+-?[\d.]+)?)$',
+    re.IGNORECASE
+)
+CIRCLE = re.compile(
+    r'^' + ASK + r'(?P<quantity>area|circumference|perimeter)\s+of\s+(?:a|the)\s+circle\s+'
+    r'(?:with|of|whose|having)\s+(?:a\s+)?(?P<measure>radius|diameter)\s*(?:is|of|=)?\s*'
+    r'(?P<value>\d+(?:\.\d+)?)\s*(?P<unit>[a-z]{1,3})?$',
+    re.IGNORECASE
+)
+
+
+def parse(text):
+    """Parse user-typed math with SymPy, or return None if it isn't plain math"""
+    text = text.strip()
+    if len(text) > 200 or not is_plain_math(text):
+        return None
+    expr = parse_expression(text)
+    return expr if isinstance(expr, sp.Expr) else None
+
+
+def expanded_terms(expr):
+    """How many terms sp.expand would produce, counted without expanding"""
+    if expr.is_Add:
+        return sum(expanded_terms(arg) for arg in expr.args)
+    if expr.is_Mul:
+        return prod(expanded_terms(arg) for arg in expr.args)
+    if expr.is_Pow and expr.exp.is_Integer and expr.exp > 0:
+        terms = expanded_terms(expr.base)
+        return comb(int(expr.exp) + terms - 1, terms - 1)
+    return 1
+
+
+def costly_integrand(expr, var):
+    """True if integrating expr could take SymPy more than a moment"""
+    if expr.is_polynomial(var):
+        return estimate_degree(expr) > MAX_LOCAL_DEGREE
+    functions = sum(1 for node in sp.preorder_traversal(expr) if isinstance(node, sp.Function))
+    roots = any(not power.exp.is_Integer and estimate_degree(power.base) > 2 for power in expr.atoms(sp.Pow))
+    return estimate_degree(expr) > MAX_INTEGRAND_DEGREE or functions > MAX_INTEGRAND_FUNCTIONS or roots
+
+
+def format_expr(expr):
+    """Render a SymPy expression the way people type it: 6x + 2, x^2, √2, π"""
+    text = sp.sstr(expr)
+    text = text.replace('**', '^')
+    text = re.sub(r'sqrt\(([^()]+)\)', r'√(\1)', text)
+    text = re.sub(r'√\((\w+)\)', r'√\1', text)
+    text = re.sub(r'\bpi\b', 'π', text)
+    text = re.sub(r'\bE\b', 'e', text)
+    text = re.sub(r'\bI\b', 'i', text)
+    # Drop the * after a coefficient (6*x -> 6x) but not after an exponent (x^2*sin(x))
+    text = re.sub(r'(?<![\^\w.])(\d+)\*(?=[a-zA-Zπ√(])', r'\1', text)
+    return text
+
+
+def with_decimal(expr):
+    """Exact value, plus a decimal approximation when the exact form isn't a plain number"""
+    exact = format_expr(expr)
+    if expr.free_symbols or expr.is_Integer:
+        return exact
+    value = complex(sp.N(expr))
+    if value.imag:
+        return exact
+    decimal = f'{value.real:.4f}'.rstrip('0').rstrip('.')
+    return exact if decimal == exact else f'{exact} ≈ {decimal}'
+
+
+def pick_variable(expr, name=None):
+    """The variable to work in: the one named, or the only free symbol"""
+    if name:
+        return sp.Symbol(name)
+    symbols = expr.free_symbols
+    if len(symbols) != 1:
+        return None
+    return next(iter(symbols))
+
+
+def solve_equation(match):
+    sides = match.group('expr').split('=')
+    lhs, rhs = parse(sides[0]), parse(sides[1])
+    if lhs is None or rhs is None or estimate_degree(lhs - rhs) > MAX_POLY_DEGREE:
+        return None
+    expr = sp.expand(lhs - rhs)
+    var = pick_variable(expr, match.group('var') or match.group('var2'))
+    if var is None or var not in expr.free_symbols:
+        return None
+    try:
+        poly = sp.Poly(expr, var)
+    except sp.PolynomialError:
+        return None
+    if not poly.free_symbols <= {var} or not 1 <= poly.degree() <= MAX_POLY_DEGREE:
+        return None
+
+    roots = sp.roots(poly)
+    if sum(roots.values()) != poly.degree():
+        return None
+    if poly.degree() > MAX_RADICAL_DEGREE and not all(root.is_rational for root in roots):
+        return None
+
+    ordered = sorted(roots, key=lambda root: (not root.is_real, complex(sp.N(root)).real, complex(sp.N(root)).imag))
+    lines = [f'{var} = {with_decimal(root)}' for root in ordered]
+    if len(lines) == 1:
+        return f'Solution: {lines[0]}'
+    return 'Solutions:\n' + '\n'.join(lines)
+
+
+def differentiate(match):
+    expr = parse(match.group('expr'))
+    if expr is None:
+        return None
+    var = pick_variable(expr, match.group('var') or match.group('dvar'))
+    if var is None:
+        return None
+    derivative = sp.diff(expr, var)
+    if is_undefined(derivative):
+        return None
+    return f'd/d{var} [{format_expr(expr)}] = {format_expr(derivative)}'
+
+
+def integrate(match):
+    expr = parse(match.group('expr'))
+    if expr is None or sp.count_ops(expr) > 20:
+        return None
+    var = pick_variable(expr, match.group('var') or match.group('dvar'))
+    if var is None or costly_integrand(expr, var):
+        return None
+
+    lower, upper = match.group('lower'), match.group('upper')
+    if lower is not None:
+        a, b = parse(lower), parse(upper)
+        if a is None or b is None or a.free_symbols or b.free_symbols:
+            return None
+        value = sp.integrate(expr, (var, a, b))
+        if value.has(sp.Integral) or is_undefined(value):
+            return None
+        return f'∫ from {format_expr(a)} to {format_expr(b)} of {format_expr(expr)} d{var} = {with_decimal(sp.simplify(value))}'
+
+    antiderivative = sp.integrate(expr, var)
+    if antiderivative.has(sp.Integral) or is_undefined(antiderivative):
+        return None
+    return f'∫ {format_expr(expr)} d{var} = {format_expr(antiderivative)} + C'
+
+
+def transform(match):
+    expr = parse(match.group('expr'))
+    if expr is None or estimate_degree(expr) > MAX_LOCAL_DEGREE:
+        return None
+    op = match.group('op').lower()
+    if op == 'expand':
+        if expanded_terms(expr) > MAX_EXPANDED_TERMS:
+            return None
+        result = sp.expand(expr)
+    elif op == 'simplify':
+        result = sp.simplify(expr)
+    else:
+        result = sp.factor(expr)
+    if is_undefined(result):
+        return None
+    return f'{format_expr(expr)} = {format_expr(result)}'
+
+
+def number_text(value):
+    if value == int(value):
+        return str(int(value))
+    return with_decimal(value)
+
+
+def describe_numbers(match):
+    numbers = [sp.Rational(token) for token in re.findall(r'-?\d+(?:\.\d+)?', match.group('numbers'))]
+    if len(numbers) < 2:
+        return None
+
+    lines = []
+    for name in re.findall(STAT_NAMES, match.group('stats').lower()):
+        if name in ('mean', 'average'):
+            lines.append(f'{name.capitalize()} = {number_text(sum(numbers) / len(numbers))}')
+        elif name == 'median':
+            ordered = sorted(numbers)
+            middle = len(ordered) // 2
+            median = ordered[middle] if len(ordered) % 2 else (ordered[middle - 1] + ordered[middle]) / 2
+            lines.append(f'Median = {number_text(median)}')
+        elif name == 'mode':
+            counts = Counter(numbers)
+            top = max(counts.values())
+            if top == 1:
+                lines.append('Mode: none (every value appears once)')
+            else:
+                modes = sorted(value for value, count in counts.items() if count == top)
+                lines.append(f"Mode = {', '.join(number_text(value) for value in modes)}")
+        elif name == 'range':
+            lines.append(f'Range = {number_text(max(numbers) - min(numbers))}')
+        elif name == 'sum':
+            lines.append(f'Sum = {number_text(sum(numbers))}')
+    return '\n'.join(lines) or None
+
+
+def circle(match):
+    value = sp.nsimplify(match.group('value'))
+    radius = value / 2 if match.group('measure').lower() == 'diameter' else value
+    unit = match.group('unit') or ''
+    if match.group('quantity').lower() == 'area':
+        suffix = f' {unit}²' if unit else ''
+        return f'Area = πr² = {with_decimal(sp.pi * radius ** 2)}{suffix}'
+    suffix = f' {unit}' if unit else ''
+    return f'Circumference = 2πr = {with_decimal(2 * sp.pi * radius)}{suffix}'
+
+
+SOLVERS = (
+    (SOLVE, solve_equation),
+    (DERIVATIVE, differentiate),
+    (INTEGRAL, integrate),
+    (TRANSFORM, transform),
+    (STATISTICS, describe_numbers),
+    (CIRCLE, circle),
+)
+
+
+@lru_cache(maxsize=1024)
+def solve_locally(question):
+    """Answer a simple question with SymPy, or return None when the LLM should handle it"""
+    text = ' '.join(str(question).split()).rstrip('?.! ')
+    if not text or '\n' in str(question).strip() or len(text) > 300:
+        return None
+    for pattern, solver in SOLVERS:
+        match = pattern.match(text)
+        if match:
+            try:
+                answer = solver(match)
+            except Exception as e:
+                print(f"Local solver error: {e}")
+                return None
+            return answer if answer is None or len(answer) <= MAX_ANSWER_LENGTH else None
+    return None
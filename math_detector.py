@@ -0,0 +1,174 @@
+"""Fast local scoring of document text for math content.
+
+Text is split into question blocks: a numbered item with the lines that
+follow it, or a run of lines up to a blank line. Each block gets a 0-1
+score from cheap signals: math notation (the same symbols clean_expression
+understands), equation and arithmetic patterns, question wording and math
+vocabulary. A question asked about two or more numbers counts as a word
+problem even without notation. Lines that look like a bare expression are
+confirmed by parsing them with SymPy. Blocks are kept or dropped whole, so
+a word problem spread over several lines reaches the LLM intact.
+"""
+import re
+from functools import lru_cache
+
+import sympy as sp
+
+from expressions import clean_expression
+
+DEFAULT_THRESHOLD = 0.4
+
+NOTATION = re.compile(r'[²³⁴⁵^√×÷=≠≤≥<>π∫∑∞°%]')
+EQUATION = re.compile(r'[\w)²³]\s*(?:=|≠|≤|≥|<|>)\s*[-\w(√]')
+ARITHMETIC = re.compile(r'\d\s*[-+*/×÷^]\s*[\d(a-zA-Z]|(?<![a-zA-Z])[a-zA-Z]\s*[-+*/×÷^]\s*\d|\b[a-z]\s*[²³⁴⁵^]')
+# "9-5", "555-1234", "2019-2020" and "10/25" are as often hours, phone numbers,
+# years and dates as arithmetic, so on their own they are only a weak signal
+NUMBER_PAIR = re.compile(r'\d+\s*[-/]\s*\d+')
+FUNCTION_CALL = re.compile(r'\b(?:sin|cos|tan|log|ln|sqrt|exp|f|g)\s*\(')
+NUMBER = re.compile(r'\d+(?:\.\d+)?')
+QUESTION = re.compile(
+    r'\?\s*$|^\s*(?:q(?:uestion)?\s*)?\d+\s*[.):]|\b(?:solve|find|calculate|compute|evaluate|simplify|'
+    r'factori[sz]e|expand|prove|show that|determine|work out|how many|how much|what is)\b',
+    re.IGNORECASE
+)
+VOCABULARY = re.compile(
+    r'\b(?:equation|inequality|derivative|differentiate|integra(?:l|te)|limit|matrix|vector|'
+    r'polynomial|quadratic|linear|function|graph|slope|gradient|area|perimeter|volume|radius|'
+    r'diameter|circumference|angle|triangle|circle|rectangle|square|mean|median|mode|average|'
+    r'probability|percent(?:age)?|ratio|fraction|sum|product|root|exponent|logarithm)\b',
+    re.IGNORECASE
+)
+# Asking for something about given numbers is what makes a word problem
+WORD_PROBLEM_CUE = re.compile(
+    r'\?|\b(?:how (?:many|much|long|far|fast|old)|what is|find|calculate|work out|determine)\b',
+    re.IGNORECASE
+)
+# A numbered item starts a new block; "3.5x" is not an item number
+ITEM_START = re.compile(r'^\s*(?:(?:q(?:uestion)?\s*)?\d+[.):](?!\d)|\(\d+\))', re.IGNORECASE)
+MAX_BLOCK_LINES = 8
+# Short lines made only of expression characters are worth a SymPy parse
+EXPRESSION_ONLY = re.compile(r'^[\w\s+\-*/^().=²³⁴⁵√×÷]{1,80}$')
+WORD = re.compile(r'[a-zA-Z]{3,}')
+
+
+@lru_cache(maxsize=4096)
+def parses_as_math(text):
+    """True if every side of the (in)equality parses as a SymPy expression with a number or symbol"""
+    if len(WORD.findall(text)) > 2 or '_' in text:
+        return False
+    try:
+        sides = [side for side in re.split(r'[=<>]', clean_expression(text)) if side.strip()]
+        if not sides:
+            return False
+        for side in sides:
+            expr = sp.sympify(side, evaluate=False)
+            if not isinstance(expr, sp.Basic) or not (expr.free_symbols or expr.atoms(sp.Number)):
+                return False
+        return True
+    except Exception:
+        return False
+
+
+def score_line(line):
+    """Score one line of text from 0 (prose) to 1 (clearly math)"""
+    text = line.strip()
+    if not text:
+        return 0.0
+
+    score = 0.0
+    if EQUATION.search(text):
+        score += 0.45
+    if FUNCTION_CALL.search(text) or ARITHMETIC.search(NUMBER_PAIR.sub('0', text)):
+        score += 0.3
+    elif ARITHMETIC.search(text):
+        score += 0.1
+    if NOTATION.search(text):
+        score += 0.15
+    if QUESTION.search(text):
+        score += 0.2
+    if VOCABULARY.search(text):
+        score += 0.2
+    if NUMBER.search(text):
+        score += 0.1
+
+    # Bare expressions like "3x² + 2x - 5" have little else to go on
+    if score < 1 and EXPRESSION_ONLY.match(text) and parses_as_math(text):
+        score += 0.4
+
+    return min(score, 1.0)
+
+
+def score_block(lines):
+    """Score a question block as a whole; never lower than its best line"""
+    text = ' '.join(line.strip() for line in lines)
+    score = score_line(text)
+    if len(NUMBER.findall(text)) >= 2 and WORD_PROBLEM_CUE.search(text):
+        score += 0.15
+    return min(max([score] + [score_line(line) for line in lines]), 1.0)
+
+
+def _split_trailing_prose(block):
+    """Yield the block, with trailing lines that carry no math signal at all as a block of their own"""
+    end = len(block)
+    while end > 1 and score_line(block[end - 1]) == 0 and not WORD_PROBLEM_CUE.search(block[end - 1]):
+        end -= 1
+    yield block[:end]
+    if end < len(block):
+        yield block[end:]
+
+
+def question_blocks(segments):
+    """Yield lists of non-empty lines, one per question block, across segment boundaries.
+
+    A block ends at a blank line, before a numbered item or after
+    MAX_BLOCK_LINES lines, so a paragraph-per-line DOCX still groups a word
+    problem's lines together. Prose after the last question isn't glued to it.
+    """
+    block = []
+    for segment in segments:
+        for line in segment.splitlines():
+            if not line.strip():
+                if block:
+                    yield from _split_trailing_prose(block)
+                block = []
+                continue
+            if block and (ITEM_START.match(line) or len(block) >= MAX_BLOCK_LINES):
+                yield from _split_trailing_prose(block)
+                block = []
+            block.append(line)
+    if block:
+        yield from _split_trailing_prose(block)
+
+
+def filter_math_segments(segments, threshold=DEFAULT_THRESHOLD, stats=None):
+    """Yield each math question block as one segment, dropping the rest.
+
+    If a stats dict is given it is filled with line and character counts
+    for what was read and what was kept.
+    """
+    if stats is not None:
+        stats.update(lines=0, kept_lines=0, chars=0, kept_chars=0)
+    for block in question_blocks(segments):
+        kept = score_block(block) >= threshold
+        if stats is not None:
+            chars = sum(len(line) for line in block)
+            stats['lines'] += len(block)
+            stats['chars'] += chars
+            if kept:
+                stats['kept_lines'] += len(block)
+                stats['kept_chars'] += chars
+        if kept:
+            yield "\n".join(block)
+
+
+def detect_questions(segments, threshold=DEFAULT_THRESHOLD):
+    """Return the math question blocks of a document as single lines, in order and without duplicates"""
+    questions = []
+    seen = set()
+    for block in filter_math_segments(segments, threshold):
+        question = ' '.join(line.strip() for line in block.splitlines())
+        key = ' '.join(question.lower().split())
+        if key not in seen:
+            seen.add(key)
+            questions.append(question)
+    return questions
@@ -0,0 +1,208 @@
+"""Lightweight request metrics with a Prometheus text exposition.
+
+Each process keeps its counters and histograms in memory, and a background
+thread writes them to metrics-<pid>.json every flush_interval seconds when
+they have changed. The directory is shared by all gunicorn workers, and
+render() merges every worker's file, so /metrics shows the same totals
+whichever worker answers it. Clear the directory when the server starts
+(gunicorn.conf.py does this in on_starting).
+"""
+import contextvars
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+COUNTER = 'counter'
+HISTOGRAM = 'histogram'
+
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# name -> (type, help)
+DEFINITIONS = {
+    'mathsolver_http_request_duration_seconds': (HISTOGRAM, 'HTTP request latency by endpoint and status'),
+    'mathsolver_stage_duration_seconds': (HISTOGRAM, 'Time spent in each stage of handling an action'),
+    'mathsolver_document_page_duration_seconds': (HISTOGRAM, 'Text extraction time per document page'),
+    'mathsolver_llm_tokens_total': (COUNTER, 'Tokens used by LLM completions'),
+    'mathsolver_prompt_tokens_total': (COUNTER, 'Estimated tokens in built prompts by action'),
+    'mathsolver_prompt_truncations_total': (COUNTER, 'Prompts whose question was cut to the token budget'),
+    'mathsolver_cache_requests_total': (COUNTER, 'Cache lookups by cache and result'),
+    'mathsolver_errors_total': (COUNTER, 'Errors by action and stage'),
+}
+
+# The action being handled on this thread, used to label every span inside it
+current_action = contextvars.ContextVar('current_action', default='none')
+
+
+def _series_key(name, labels):
+    return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + '}'
+
+
+class Metrics:
+    """Per-process registry of counters and histograms, shared through per-pid files"""
+
+    def __init__(self, directory=None, flush_interval=1.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._counters = {}
+        self._histograms = {}
+        self._pid = os.getpid()
+        self._dirty = False
+        self._flusher = None
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _check_fork(self):
+        # A forked worker starts from zero rather than re-reporting its parent's
+        # numbers, and needs its own flusher thread
+        if self._pid != os.getpid():
+            self._counters.clear()
+            self._histograms.clear()
+            self._pid = os.getpid()
+            self._flusher = None
+        if self.directory and self._flusher is None:
+            self._flusher = threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True)
+            self._flusher.start()
+        self._dirty = True
+
+    def _flush_loop(self):
+        pid = os.getpid()
+        while self._pid == pid:
+            time.sleep(self.flush_interval)
+            if self._dirty:
+                self.flush()
+
+    def inc(self, name, amount=1, **labels):
+        with self._lock:
+            self._check_fork()
+            key = _series_key(name, labels)
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        with self._lock:
+            self._check_fork()
+            key = _series_key(name, labels)
+            series = self._histograms.get(key)
+            if series is None:
+                series = self._histograms[key] = {'buckets': [0] * len(BUCKETS), 'sum': 0.0, 'count': 0}
+            for index, bound in enumerate(BUCKETS):
+                if value <= bound:
+                    series['buckets'][index] += 1
+                    break
+            series['sum'] += value
+            series['count'] += 1
+
+    @contextmanager
+    def span(self, stage, **labels):
+        """Time a block as one stage of the current action; errors are counted and re-raised"""
+        labels.setdefault('action', current_action.get())
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.inc('mathsolver_errors_total', action=labels['action'], stage=stage)
+            raise
+        finally:
+            self.observe('mathsolver_stage_duration_seconds', time.perf_counter() - start, stage=stage, **labels)
+
+    @contextmanager
+    def action(self, action):
+        """Label every span inside the block with this action"""
+        token = current_action.set(action)
+        try:
+            yield
+        finally:
+            current_action.reset(token)
+
+    def _snapshot(self):
+        with self._lock:
+            self._dirty = False
+            return {
+                'counters': [[name, list(labels), value] for (name, labels), value in self._counters.items()],
+                'histograms': [
+                    [name, list(labels), dict(series, buckets=list(series['buckets']))]
+                    for (name, labels), series in self._histograms.items()
+                ],
+            }
+
+    def flush(self):
+        """Write this process's numbers to its file in the shared directory"""
+        if not self.directory:
+            return
+        path = os.path.join(self.directory, f'metrics-{os.getpid()}.json')
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(self._snapshot(), f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Metrics flush error: {e}")
+
+    def _load_all(self):
+        if not self.directory:
+            return [self._snapshot()]
+        self.flush()
+        snapshots = []
+        for path in glob.glob(os.path.join(self.directory, 'metrics-*.json')):
+            try:
+                with open(path) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+    def render(self):
+        """Prometheus text format for every worker's metrics combined"""
+        counters = {}
+        histograms = {}
+        for snapshot in self._load_all():
+            for name, labels, value in snapshot['counters']:
+                key = (name, tuple(map(tuple, labels)))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, series in snapshot['histograms']:
+                key = (name, tuple(map(tuple, labels)))
+                merged = histograms.setdefault(key, {'buckets': [0] * len(BUCKETS), 'sum': 0.0, 'count': 0})
+                merged['buckets'] = [a + b for a, b in zip(merged['buckets'], series['buckets'])]
+                merged['sum'] += series['sum']
+                merged['count'] += series['count']
+
+        lines = []
+        for name, (kind, help_text) in DEFINITIONS.items():
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            if kind == COUNTER:
+                for (series_name, labels), value in sorted(counters.items()):
+                    if series_name == name:
+                        lines.append(f'{name}{_format_labels(labels)} {value}')
+                continue
+            for (series_name, labels), series in sorted(histograms.items()):
+                if series_name != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(BUCKETS, series['buckets']):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{_format_labels(labels, [("le", repr(bound))])} {cumulative}')
+                lines.append(f'{name}_bucket{_format_labels(labels, [("le", "+Inf")])} {series["count"]}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {series["sum"]}')
+                lines.append(f'{name}_count{_format_labels(labels)} {series["count"]}')
+        return '\n'.join(lines) + '\n'
+
+
+def clear_directory(directory):
+    """Remove worker files left over from a previous run"""
+    for path in glob.glob(os.path.join(directory, 'metrics-*.json*')):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
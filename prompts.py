@@ -0,0 +1,300 @@
+"""Prompt templates for the /solve actions and the LLM calls behind them.
+
+Templates are written indented for readability; REGISTRY holds them
+dedented and compacted once at import, so the indentation isn't sent (and
+billed) on every call. Each entry is a PromptSpec with the template's
+temperature, a max_tokens cap for the reply and a budget for the inserted
+question. Templates receive the user's question as {question}.
+"""
+import os
+import re
+import textwrap
+from collections import namedtuple
+
+from documents import estimate_tokens
+
+# Longest question, in estimated tokens, inserted into a prompt; longer ones
+# are cut at a word boundary
+QUESTION_TOKEN_BUDGET = int(os.environ.get('QUESTION_TOKEN_BUDGET', 1000))
+TRUNCATION_MARK = ' [...]'
+
+
+SOLVE_PROMPT = "Solve this maths question and provide the answer:\n{question}"
+
+# Sent once when an answer to SOLVE_PROMPT fails the SymPy check
+SOLVE_RECHECK_PROMPT = """Solve this maths question and provide the answer:
+{question}
+
+This earlier answer was checked and is incorrect:
+{previous}
+
+Solve it again carefully and state the final answer clearly."""
+
+EXPLAIN_PROMPT = "Explain step-by-step solution for:\n{question}"
+
+EXTRACT_PROMPT = "Extract only math questions (no explanations) from this text:\n{question}"
+
+ALTERNATIVE_METHODS_PROMPT = """
+        Show 2-3 DIFFERENT methods to solve this problem: {question}
+        
+        Format your response as:
+        
+        METHOD 1: [Method Name]
+        [Step-by-step solution using this method]
+        
+        METHOD 2: [Method Name]
+        [Step-by-step solution using this method]
+        
+        METHOD 3: [Method Name] (if applicable)
+        [Step-by-step solution using this method]
+        
+        WHICH TO USE: Brief note on when each method is best
+        """
+
+PRACTICE_SIMILAR_PROMPT = """
+        Based on this problem: {question}
+        
+        Generate 5 similar practice problems with INCREASING difficulty.
+        For each problem, provide:
+        - The problem statement
+        - The answer (hidden behind a spoiler marker)
+        
+        Format:
+        PROBLEM 1: [Easy - similar to original]
+        [problem text]
+        Answer: [answer]
+        
+        PROBLEM 2: [Medium]
+        [problem text]
+        Answer: [answer]
+        
+        ... continue for 5 problems total
+        """
+
+COMMON_MISTAKES_PROMPT = """
+        For this problem: {question}
+        
+        List the 3-5 most COMMON MISTAKES students make when solving this.
+        For each mistake:
+        1. Show the incorrect approach
+        2. Explain WHY it's wrong
+        3. Show the correct approach
+        
+        Format:
+        MISTAKE 1: [Brief title]
+        Incorrect approach: [what students do wrong]
+        Why it's wrong: [explanation]
+        Correct approach: [right way]
+        
+        Continue for all common mistakes...
+        """
+
+REAL_WORLD_PROMPT = """
+        For this math problem: {question}
+        
+        Explain 3 REAL-WORLD applications where this type of math is actually used.
+        Include:
+        - Specific profession/industry
+        - Concrete example scenario
+        - Why this math matters there
+        
+        Make it interesting and relatable to students!
+        
+        Format:
+        APPLICATION 1: [Field/Industry]
+        Scenario: [Concrete example]
+        Why it matters: [Explanation]
+        
+        Continue for 3 applications...
+        """
+
+DIFFICULTY_LADDER_PROMPT = """
+        Based on this problem: {question}
+        
+        Create a difficulty ladder:
+        
+        EASIER VERSION (Beginner):
+        [Simpler problem with same concept]
+        Solution: [brief solution]
+        
+        CURRENT PROBLEM (Intermediate):
+        {question}
+        
+        HARDER VERSION (Advanced):
+        [More complex problem with same concept]
+        Solution: [brief solution]
+        
+        EXPERT VERSION (Challenge):
+        [Very difficult problem with same concept]
+        Solution: [brief solution]
+        """
+
+TUTOR_MODE_PROMPT = """
+        Act as a patient tutor. For this problem: {question}
+        
+        DO NOT give the answer directly. Instead provide:
+        
+        1. WHAT TYPE OF PROBLEM: Identify what math concept this is
+        2. KEY CONCEPT: What principle/formula is needed?
+        3. FIRST STEP: What should the student do first? (be specific but don't solve)
+        4. HINT FOR MIDDLE: What to watch out for in the middle steps
+        5. HOW TO CHECK: How can they verify their answer is correct?
+        
+        Encourage them to try solving it themselves!
+        """
+
+ELI5_PROMPT = """
+        Explain this math problem to a 5-year-old: {question}
+        
+        Use:
+        - Simple words
+        - Fun analogies (cookies, toys, animals, etc.)
+        - Short sentences
+        - No jargon
+        
+        Make it fun and easy to understand!
+        Then show the solution in simple terms.
+        """
+
+CONCEPT_MAP_PROMPT = """
+        For this problem: {question}
+        
+        Create a concept map showing:
+        
+        PREREQUISITES (What you need to know first):
+        - [Concept 1]
+        - [Concept 2]
+        - [Concept 3]
+        
+        THIS PROBLEM USES:
+        - [Main concept 1]
+        - [Main concept 2]
+        - [Main concept 3]
+        
+        NEXT STEPS (What to learn after this):
+        - [Advanced topic 1]
+        - [Advanced topic 2]
+        - [Advanced topic 3]
+        
+        GRADE LEVEL: [What grade typically learns this]
+        """
+
+DIFFICULTY_RATING_PROMPT = """
+        Analyze this problem: {question}
+        
+        Provide:
+        
+        DIFFICULTY RATING: [1-10 scale]
+        
+        GRADE LEVEL: [What grade]
+        
+        TIME ESTIMATE: [How long it should take]
+        
+        COMPLEXITY FACTORS:
+        - [What makes it easy/hard]
+        - [Skills required]
+        - [Common challenges]
+        
+        RECOMMENDATION: [Who should attempt this problem]
+        """
+
+WORKSHEET_PROMPT = """
+        Based on this problem: {question}
+        
+        Create a PRACTICE WORKSHEET with 10 problems of varying difficulty.
+        
+        Format:
+        
+        === PRACTICE WORKSHEET ===
+        Topic: [Identify the topic]
+        
+        SECTION A: Easy (Problems 1-3)
+        1. [problem]
+        2. [problem]
+        3. [problem]
+        
+        SECTION B: Medium (Problems 4-7)
+        4. [problem]
+        5. [problem]
+        6. [problem]
+        7. [problem]
+        
+        SECTION C: Hard (Problems 8-10)
+        8. [problem]
+        9. [problem]
+        10. [problem]
+        
+        === ANSWER KEY ===
+        1. [answer]
+        2. [answer]
+        ... (all answers)
+        """
+
+
+BLANK_RUNS = re.compile(r'\n{3,}')
+
+
+class PromptSpec(namedtuple('PromptSpec', ['template', 'temperature', 'max_tokens', 'question_tokens'])):
+    """A compacted template with its sampling settings; None means no limit"""
+    __slots__ = ()
+
+
+class Prompt(namedtuple('Prompt', ['text', 'temperature', 'max_tokens', 'tokens', 'truncated'])):
+    """A filled-in prompt, its estimated token count and whether the question was cut"""
+    __slots__ = ()
+
+
+def compact(template):
+    """Drop the source indentation, trailing spaces and surrounding blank lines from a template"""
+    lines = [line.rstrip() for line in textwrap.dedent(template).strip().splitlines()]
+    return BLANK_RUNS.sub('\n\n', '\n'.join(lines))
+
+
+def _spec(template, temperature, max_tokens, question_tokens=QUESTION_TOKEN_BUDGET):
+    return PromptSpec(compact(template), temperature, max_tokens, question_tokens)
+
+
+# The /solve actions; max_tokens leaves room for the longest reply each format asks for
+PROMPTS = {
+    'solve': _spec(SOLVE_PROMPT, 0, 1024),
+    'explain': _spec(EXPLAIN_PROMPT, 0, 1536),
+    'alternative_methods': _spec(ALTERNATIVE_METHODS_PROMPT, 0.3, 2048),
+    'practice_similar': _spec(PRACTICE_SIMILAR_PROMPT, 0.7, 1536),
+    'common_mistakes': _spec(COMMON_MISTAKES_PROMPT, 0.3, 2048),
+    'real_world': _spec(REAL_WORLD_PROMPT, 0.5, 1024),
+    'difficulty_ladder': _spec(DIFFICULTY_LADDER_PROMPT, 0.5, 1536),
+    'tutor_mode': _spec(TUTOR_MODE_PROMPT, 0.3, 1024),
+    'eli5': _spec(ELI5_PROMPT, 0.5, 1024),
+    'concept_map': _spec(CONCEPT_MAP_PROMPT, 0.3, 768),
+    'difficulty_rating': _spec(DIFFICULTY_RATING_PROMPT, 0.3, 768),
+    'worksheet': _spec(WORKSHEET_PROMPT, 0.7, 2048),
+}
+
+# Every prompt the app sends. Document chunks are already sized by
+# EXTRACT_CHUNK_TOKENS, so extraction neither truncates nor caps the reply.
+REGISTRY = dict(
+    PROMPTS,
+    solve_recheck=_spec(SOLVE_RECHECK_PROMPT, 0, 1024),
+    extract=_spec(EXTRACT_PROMPT, 0, None, question_tokens=None),
+)
+
+
+def truncate(text, budget):
+    """Cut text to about budget tokens at a word boundary; returns (text, truncated)"""
+    if estimate_tokens(text) <= budget:
+        return text, False
+    cut = text[:budget * 4]
+    space = cut.rfind(' ')
+    if space > len(cut) // 2:
+        cut = cut[:space]
+    return cut.rstrip() + TRUNCATION_MARK, True
+
+
+def build_prompt(name, question, **fields):
+    """Fill in a registry template, cutting the question to its budget; returns a Prompt"""
+    prompt_spec = REGISTRY[name]
+    truncated = False
+    if prompt_spec.question_tokens is not None:
+        question, truncated = truncate(question, prompt_spec.question_tokens)
+    text = prompt_spec.template.format(question=question, **fields)
+    return Prompt(text, prompt_spec.temperature, prompt_spec.max_tokens, estimate_tokens(text), truncated)
@@ -1,2 +1,2 @@
-#!/bin/bash
-gunicorn app:app
+#!/bin/bash
+gunicorn -c gunicorn.conf.py app:app
@@ -0,0 +1,36 @@
+import os
+
+import numpy as np
+import pytest
+
+os.environ.setdefault('METRICS_DIR', '')
+
+from app import adaptive_sample  # noqa: E402
+
+
+def crossings(x_vals, y_vals, limit):
+    """Line segments that join finite points on opposite sides of a tall jump"""
+    finite = np.isfinite(y_vals[:-1]) & np.isfinite(y_vals[1:])
+    jump = np.abs(np.diff(y_vals)) > limit
+    return int(np.sum(finite & jump & (np.sign(y_vals[:-1]) != np.sign(y_vals[1:]))))
+
+
+@pytest.mark.parametrize('max_points', [100, 400])
+def test_tan_breaks_at_every_asymptote(max_points):
+    x_vals, y_vals = adaptive_sample(np.tan, -10, 10, max_points)
+    assert len(x_vals) <= max_points
+    assert np.isnan(y_vals).sum() >= 6
+    assert crossings(x_vals, y_vals, 50) == 0
+
+
+@pytest.mark.parametrize('max_points', [100, 400, 1000])
+def test_breaks_count_toward_max_points(max_points):
+    with np.errstate(all='ignore'):
+        x_vals, y_vals = adaptive_sample(lambda x: np.sin(1 / x), -1, 1, max_points)
+    assert len(x_vals) <= max_points
+
+
+def test_smooth_curves_have_no_breaks():
+    for func in (np.sin, lambda x: x ** 3, lambda x: 1000 * (x - 0.013)):
+        _, y_vals = adaptive_sample(func, -5, 5, 400)
+        assert not np.isnan(y_vals).any()
@@ -0,0 +1,72 @@
+import time
+
+import numpy as np
+import sympy as sp
+
+from expressions import clean_expression, compile_expression, estimate_degree, is_plain_math, parse_expression
+
+x = sp.Symbol('x')
+
+
+def test_implicit_multiplication_and_notation():
+    assert clean_expression('2x(x+1)') == '2*x*(x+1)'
+    assert clean_expression('x² + √x') == 'x**2 + sqrt(x)'
+    assert clean_expression('sin(x)') == 'sin(x)'
+
+
+def test_plain_math_allows_only_known_names():
+    assert is_plain_math('2x² + sin(x) - √x')
+    assert is_plain_math('x + 2 - (5)')
+    assert not is_plain_math('x + factorial(9^9)')
+    assert not is_plain_math('__import__("os").system("id")')
+    assert not is_plain_math('speed times time')
+    assert not is_plain_math('  ')
+
+
+def test_pi_is_a_constant_next_to_letters():
+    assert parse_expression('2πx') == 2 * sp.pi * x
+    assert parse_expression('πr²') == sp.pi * sp.Symbol('r') ** 2
+    assert is_plain_math('2πx')
+
+
+def test_parses_plain_math():
+    assert parse_expression('x^2 + 3x') == x**2 + 3*x
+    assert parse_expression('2^10') == 1024
+    assert parse_expression('e^x') == sp.exp(x)
+
+
+def test_power_tower_is_rejected_without_evaluating():
+    start = time.perf_counter()
+    assert parse_expression('9^9^9') is None
+    assert parse_expression('x + 9^9^9') is None
+    assert parse_expression('2^(-5000)') is None
+    assert time.perf_counter() - start < 1
+
+
+def test_decimals_parse_exactly():
+    assert parse_expression('0.5x') == x / 2
+
+
+def test_estimate_degree_does_not_expand():
+    start = time.perf_counter()
+    assert estimate_degree(parse_expression('(x+1)^999*(x+2)^999')) == 1998
+    assert time.perf_counter() - start < 1
+    assert estimate_degree(parse_expression('x^3 + 2x')) == 3
+    assert estimate_degree(parse_expression('sin(x)^2*exp(x)')) == 3
+    assert estimate_degree(parse_expression('7')) == 0
+
+
+def test_undefined_results_are_rejected():
+    assert parse_expression('x/0') is None
+    assert parse_expression('1/0') is None
+
+
+def test_unparseable_text_is_none():
+    assert parse_expression('x +* )') is None
+    assert compile_expression('x +* )') == (None, None)
+
+
+def test_compile_expression_evaluates_on_arrays():
+    expr, func = compile_expression('x^2 - 1')
+    assert expr == x**2 - 1
+    assert func(np.array([0.0, 2.0])).tolist() == [-1.0, 3.0]
@@ -0,0 +1,54 @@
+import time
+
+import pytest
+
+from local_solver import parse, solve_locally
+
+
+@pytest.mark.parametrize('question, answer', [
+    ('Solve 2x + 3 = 7', 'Solution: x = 2'),
+    ('Solve x^2 - 5x + 6 = 0', 'Solutions:\nx = 2\nx = 3'),
+    ('Solve 0.5x = 2', 'Solution: x = 4'),
+    ('Solve 0.3x + 1 = 2', 'Solution: x = 10/3 ≈ 3.3333'),
+    ('Find the derivative of x^3', 'd/dx [x^3] = 3x^2'),
+    ('Expand (x+1)^3', '(x + 1)^3 = x^3 + 3x^2 + 3x + 1'),
+    ('Integrate 2x', '∫ 2x dx = x^2 + C'),
+    ('Find the mean of 2, 4 and 9', 'Mean = 5'),
+])
+def test_answers_simple_questions(question, answer):
+    assert solve_locally(question) == answer
+
+
+def test_power_tower_returns_quickly():
+    start = time.perf_counter()
+    assert solve_locally('Simplify 9^9^9') is None
+    assert solve_locally('Solve x^(9^9) = 1') is None
+    assert time.perf_counter() - start < 1
+
+
+@pytest.mark.parametrize('question', [
+    'integrate sin(x)^7*cos(x)^5*exp(x)',
+    'expand (x+y+z)^300',
+    'Solve (x+y+z)^300 = 1',
+    'Simplify (x+1)^200*(x+2)^200',
+])
+def test_costly_questions_are_declined_quickly(question):
+    start = time.perf_counter()
+    assert solve_locally(question) is None
+    assert time.perf_counter() - start < 1
+
+
+@pytest.mark.parametrize('question', [
+    'Solve x/0 = 1',
+    'Simplify 1/0',
+    'Integral of 1/x from 0 to 1',
+    'Integral of 1/x^2 from -1 to 1',
+])
+def test_undefined_questions_go_to_the_llm(question):
+    assert solve_locally(question) is None
+
+
+def test_parse_rejects_words_and_code():
+    assert parse('speed times time') is None
+    assert parse('__import__("os")') is None
+    assert parse('') is None
@@ -0,0 +1,46 @@
+import pytest
+
+from math_detector import DEFAULT_THRESHOLD, detect_questions, score_line
+
+
+@pytest.mark.parametrize('line', [
+    'Office hours are 9-5 on weekdays.',
+    'Call 555-1234 for details.',
+    'Published 2019-2020 edition.',
+    'Chapter 3 covers pages 10-25.',
+    'Homework is due 10/25.',
+    'COVID-19 cases rose in 2021.',
+    'Calculators may be used.',
+])
+def test_prose_dates_and_phone_numbers_are_not_math(line):
+    assert score_line(line) < DEFAULT_THRESHOLD
+
+
+@pytest.mark.parametrize('line', [
+    '3x + 4 = 1',
+    'What is 12/4?',
+    'Evaluate 7-3',
+    'Simplify 3/4 + 1/2',
+    'x² - 5x + 6',
+])
+def test_math_lines_reach_the_threshold(line):
+    assert score_line(line) >= DEFAULT_THRESHOLD
+
+
+def test_prose_paragraph_with_a_phone_number_is_not_a_question():
+    segments = [
+        'Questions about the course? Call 555-1234 for details.',
+        'Office hours are 9-5 on weekdays.',
+        '',
+        '1. Solve 2x + 3 = 7',
+    ]
+    assert detect_questions(segments) == ['1. Solve 2x + 3 = 7']
+
+
+def test_word_problem_is_kept_whole():
+    segments = [
+        '1. A farmer has some chickens and some cows.',
+        'There are 30 heads and 74 legs altogether.',
+        'How many cows does the farmer have?',
+    ]
+    assert detect_questions(segments) == [' '.join(segments)]
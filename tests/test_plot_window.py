@@ -0,0 +1,32 @@
+import os
+import time
+
+import sympy as sp
+
+os.environ.setdefault('METRICS_DIR', '')
+
+from app import DEFAULT_PLOT_WINDOW, choose_plot_window, create_function_plot  # noqa: E402
+from expressions import parse_expression  # noqa: E402
+
+x = sp.Symbol('x')
+
+
+def test_window_frames_roots_and_poles():
+    low, high = choose_plot_window(parse_expression('(x^2 - 1)/(x - 20)'), x)
+    assert low < -1 and high > 20
+
+
+def test_high_degree_skips_window_analysis_quickly():
+    start = time.perf_counter()
+    assert choose_plot_window(parse_expression('(x+1)^200*(x+2)^200'), x) == DEFAULT_PLOT_WINDOW
+    assert time.perf_counter() - start < 1
+
+
+def test_high_degree_is_not_plotted():
+    start = time.perf_counter()
+    assert create_function_plot({'expression': '(x+1)^999*(x+2)^999', 'max_points': 400}) is None
+    assert time.perf_counter() - start < 1
+
+
+def test_ordinary_function_is_plotted():
+    assert create_function_plot({'expression': 'x^2 - 4', 'max_points': 400})
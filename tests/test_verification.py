@@ -0,0 +1,36 @@
+import pytest
+
+from verification import MISMATCH, UNVERIFIED, VERIFIED, verify_answer
+
+
+@pytest.mark.parametrize('question, answer', [
+    ('Solve x^3 - 3x + 1 = 0', 'The roots are x ≈ 1.532, -1.879, 0.347'),
+    ('Solve x^3 - 3x + 1 = 0', 'x ≈ 1.532, x ≈ -1.879 and x ≈ 0.347.'),
+    ('Solve x^2 - 5x + 6 = 0', 'x = 2, 3'),
+    ('Solve x^2 - 5x + 6 = 0', 'x = 2 or x = 3'),
+    ('Solve x^2 - 5x + 6 = 0', 'Factor: (x - 2)(x - 3) = 0\nx = 2\nx = 3'),
+    ('Solve 2x + 3 = 7', 'Subtract 3: 2x = 4\nSo x = 2, which checks out.'),
+    ('Find the derivative of x^3 + 2x', "f'(x) = 3x^2 + 2"),
+    ('Integrate 2x', '∫ 2x dx = x^2 + C'),
+])
+def test_correct_answers_verify(question, answer):
+    assert verify_answer(question, answer) == VERIFIED
+
+
+@pytest.mark.parametrize('question, answer', [
+    ('Solve x^2 - 5x + 6 = 0', 'x = 2'),
+    ('Solve x^2 - 5x + 6 = 0', 'x = 2, 4'),
+    ('Solve 2x + 3 = 7', 'x = 3'),
+    ('Find the derivative of x^3 + 2x', "f'(x) = 3x^2"),
+])
+def test_wrong_answers_mismatch(question, answer):
+    assert verify_answer(question, answer) == MISMATCH
+
+
+@pytest.mark.parametrize('question, answer', [
+    ('Find the derivative of x^3 + 2x', 'd/dx(x^3) = 3x^2, d/dx(2x) = 2\nSo the derivative is 3x^2 + 2'),
+    ('Solve x^2 - 5x + 6 = 0', 'The roots are two and three'),
+    ('What is a prime number', 'A number with exactly two divisors'),
+])
+def test_unreadable_answers_are_unverified(question, answer):
+    assert verify_answer(question, answer) == UNVERIFIED
@@ -0,0 +1,181 @@
+"""Check LLM answers against SymPy where the question allows it.
+
+verify_answer pulls the final answer out of a completion and checks it:
+equation roots by substitution (refined with nsolve, so rounded decimals
+pass), derivatives and antiderivatives symbolically, definite integrals
+numerically. Questions it can't parse, and answers it can't read, come back
+as UNVERIFIED rather than as a mismatch.
+"""
+import cmath
+import re
+
+import sympy as sp
+
+from local_solver import DERIVATIVE, INTEGRAL, SOLVE, parse, pick_variable
+
+EXACT = 'exact'             # answered by the local solver, nothing to check
+VERIFIED = 'verified'       # the LLM answer checks out
+CORRECTED = 'corrected'     # the first answer was wrong, the re-query checks out
+MISMATCH = 'mismatch'       # still wrong after the re-query
+UNVERIFIED = 'unverified'   # nothing SymPy can check
+
+TOLERANCE = 1e-6
+ROUNDING = 1e-2
+SAMPLE_POINTS = (-2.3, -0.7, 0.4, 1.9, 3.1, 4.7)
+
+# Markdown/LaTeX decoration that models wrap answers in
+DECORATION = re.compile(r'\\[()\[\]]|[$`*]|\\boxed\{([^{}]*)\}')
+MATH_LINE = re.compile(r'=\s*([^=]+?)\s*\.?\s*$')
+CONSTANT = re.compile(r'\s*\+\s*C\s*$')
+# Between the values in 'x = 2, 3', 'x = 2 or x = 3' and 'x = 1; check: ...'
+VALUE_SEPARATOR = re.compile(r',|;|\.\s|\bor\b|\band\b', re.IGNORECASE)
+
+
+def strip_decoration(text):
+    return DECORATION.sub(lambda match: match.group(1) or '', text)
+
+
+def close(a, b):
+    return abs(a - b) <= max(TOLERANCE, ROUNDING * max(1.0, abs(b)))
+
+
+def numeric(expr):
+    value = complex(sp.N(expr))
+    return value.real if abs(value.imag) < TOLERANCE else value
+
+
+def root_candidates(answer, var):
+    """Every value the answer assigns to var: 'x = -3', 'x = 2 or x = 3', 'x ≈ 1.53, -1.88, 0.35'"""
+    assignment = re.compile(rf'(?<![\w^]){re.escape(str(var))}\s*[=≈]\s*', re.IGNORECASE)
+    values = []
+    for line in strip_decoration(answer).splitlines():
+        start = assignment.search(line)
+        if not start:
+            continue
+        # The list ends at the first part that isn't a value, e.g. 'which checks out'
+        for part in VALUE_SEPARATOR.split(line[start.end():]):
+            value = parse(assignment.sub('', part.strip(), count=1).rstrip('. '))
+            if value is None or value.free_symbols:
+                break
+            values.append(value)
+    return values
+
+
+def is_root(f, var, value):
+    """True if value is a root of f, allowing for a rounded decimal"""
+    try:
+        if abs(complex(sp.N(f.subs(var, value)))) < TOLERANCE:
+            return True
+        guess = numeric(value)
+        root = sp.nsolve(f, var, guess)
+        return close(complex(root), complex(guess))
+    except Exception:
+        return False
+
+
+def verify_roots(match, answer):
+    sides = match.group('expr').split('=')
+    lhs, rhs = parse(sides[0]), parse(sides[1])
+    if lhs is None or rhs is None:
+        return UNVERIFIED
+    f = lhs - rhs
+    var = pick_variable(f, match.group('var') or match.group('var2'))
+    if var is None or var not in f.free_symbols:
+        return UNVERIFIED
+
+    candidates = root_candidates(answer, var)
+    if not candidates:
+        return UNVERIFIED
+    if not all(is_root(f, var, value) for value in candidates):
+        return MISMATCH
+
+    # For polynomials also make sure no real root was left out
+    try:
+        poly = sp.Poly(sp.expand(f), var)
+        if poly.free_symbols <= {var}:
+            found = [numeric(value) for value in candidates]
+            for root in poly.nroots():
+                root = numeric(root)
+                if isinstance(root, float) and not any(close(complex(root), complex(value)) for value in found):
+                    return MISMATCH
+    except sp.PolynomialError:
+        pass
+    return VERIFIED
+
+
+def final_expression(answer):
+    """The right-hand side of the answer's last line, or None if that line isn't an equation"""
+    lines = [line for line in strip_decoration(answer).splitlines() if line.strip()]
+    match = MATH_LINE.search(lines[-1]) if lines else None
+    if match is None:
+        return None
+    return parse(CONSTANT.sub('', match.group(1)))
+
+
+def same_function(a, b, var):
+    """Compare two expressions numerically at a few points (symbolic simplify is too slow here)"""
+    checked = 0
+    for point in SAMPLE_POINTS:
+        try:
+            left, right = complex(sp.N(a.subs(var, point))), complex(sp.N(b.subs(var, point)))
+        except Exception:
+            continue
+        if not (cmath.isfinite(left) and cmath.isfinite(right)):
+            continue
+        if not close(left, right):
+            return False
+        checked += 1
+    return checked >= 3
+
+
+def verify_derivative(match, answer):
+    expr = parse(match.group('expr'))
+    if expr is None:
+        return UNVERIFIED
+    var = pick_variable(expr, match.group('var') or match.group('dvar'))
+    candidate = final_expression(answer)
+    if var is None or candidate is None:
+        return UNVERIFIED
+    return VERIFIED if same_function(sp.diff(expr, var), candidate, var) else MISMATCH
+
+
+def verify_integral(match, answer):
+    expr = parse(match.group('expr'))
+    if expr is None:
+        return UNVERIFIED
+    var = pick_variable(expr, match.group('var') or match.group('dvar'))
+    candidate = final_expression(answer)
+    if var is None or candidate is None:
+        return UNVERIFIED
+
+    lower, upper = match.group('lower'), match.group('upper')
+    if lower is not None:
+        a, b = parse(lower), parse(upper)
+        if a is None or b is None or candidate.free_symbols:
+            return UNVERIFIED
+        expected = sp.Integral(expr, (var, a, b)).evalf()
+        return VERIFIED if close(complex(numeric(candidate)), complex(expected)) else MISMATCH
+
+    # Any antiderivative is right, so differentiate the answer rather than compare
+    return VERIFIED if same_function(sp.diff(candidate, var), expr, var) else MISMATCH
+
+
+VERIFIERS = (
+    (SOLVE, verify_roots),
+    (DERIVATIVE, verify_derivative),
+    (INTEGRAL, verify_integral),
+)
+
+
+def verify_answer(question, answer):
+    """Return VERIFIED, MISMATCH or UNVERIFIED for an LLM answer to question"""
+    text = ' '.join(str(question).split()).rstrip('?.! ')
+    for pattern, verifier in VERIFIERS:
+        match = pattern.match(text)
+        if match:
+            try:
+                return verifier(match, answer)
+            except Exception as e:
+                print(f"Verification error: {e}")
+                return UNVERIFIED
+    return UNVERIFIED
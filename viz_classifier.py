@@ -0,0 +1,183 @@
+"""Decide which plot, if any, fits a question.
+
+scan tokenizes the question with one compiled regex: shape, statistics,
+vector and plot keywords, number lists, vector components and where a
+"y = ..." definition starts. A fixed precedence then turns those tokens into
+a VizSpec. Finding the expression to plot takes further regex passes
+(function_expression, equation_expression), so classify is about four
+times slower than the keyword checks it replaced, in exchange for accuracy
+(see benchmarks/bench_viz_classifier.py). It still takes microseconds: no
+SymPy and no LLM are involved.
+"""
+import re
+from collections import namedtuple
+
+FUNCTION = 'function'
+GEOMETRIC = 'geometric'
+STATISTICAL = 'statistical'
+DATA = 'data'
+VECTOR = 'vector'
+NONE = 'none'
+
+
+class VizSpec(namedtuple('VizSpec', ['viz_type', 'expression', 'data', 'details'])):
+    """What to plot: the plotter type plus the fields that plotter reads"""
+    __slots__ = ()
+
+    @property
+    def can_visualize(self):
+        return self.viz_type != NONE
+
+    def as_dict(self, **extra):
+        """The viz_analysis dict the create_*_plot functions take"""
+        spec = {
+            'can_visualize': self.can_visualize,
+            'viz_type': self.viz_type,
+            'expression': self.expression,
+            'data': self.data,
+            'details': self.details,
+        }
+        spec.update(extra)
+        return spec
+
+
+NO_VISUALIZATION = VizSpec(NONE, '', '', '')
+
+KEYWORDS = {
+    'circle': GEOMETRIC, 'circles': GEOMETRIC, 'square': GEOMETRIC, 'squares': GEOMETRIC,
+    'triangle': GEOMETRIC, 'triangles': GEOMETRIC, 'rectangle': GEOMETRIC, 'rectangles': GEOMETRIC,
+    'mean': STATISTICAL, 'median': STATISTICAL, 'mode': STATISTICAL, 'average': STATISTICAL,
+    'variance': STATISTICAL, 'deviation': STATISTICAL, 'distribution': STATISTICAL,
+    'histogram': STATISTICAL, 'quartile': STATISTICAL, 'quartiles': STATISTICAL,
+    'vector': VECTOR, 'vectors': VECTOR, 'magnitude': VECTOR, 'displacement': VECTOR,
+    'plot': FUNCTION, 'graph': FUNCTION, 'sketch': FUNCTION, 'curve': FUNCTION,
+    'derivative': FUNCTION, 'differentiate': FUNCTION, 'integral': FUNCTION, 'integrate': FUNCTION,
+    'roots': FUNCTION, 'parabola': FUNCTION, 'vertex': FUNCTION, 'intercept': FUNCTION,
+    'intercepts': FUNCTION,
+    'data': DATA, 'chart': DATA, 'table': DATA, 'sales': DATA, 'scores': DATA, 'values': DATA,
+}
+
+# Group order matters where alternatives overlap
+TOKENS = re.compile(r'''
+    (?P<phrase>\bsquare\s+roots?\b)
+  | (?P<definition>\b(?:[fgh]\s*\(\s*x\s*\)|y)\s*=\s*)
+  | (?P<components>[<⟨(\[]\s*-?\d+(?:\.\d+)?\s*,\s*-?\d+(?:\.\d+)?\s*[>⟩)\]]
+                   |-?\d+(?:\.\d+)?\s*i\s*[+-]\s*\d+(?:\.\d+)?\s*j\b)
+  | (?P<number>-?\d+(?:\.\d+)?)
+  | (?P<word>[a-zA-Z]+)
+''', re.VERBOSE)
+
+FUNCTION_NAMES = r'(?:sin|cos|tan|log|ln|exp|sqrt|abs)'
+# The longest run of expression characters containing x is the thing to plot
+EXPRESSION_RUN = re.compile(
+    r'(?:' + FUNCTION_NAMES + r'|(?<![a-zA-Z])e(?![a-zA-Z])|[0-9x.+\-*/^²³⁴⁵()√π ])+'
+)
+# A definition ends at punctuation or at the first word that isn't a function name
+DEFINITION_END = re.compile(r'[,;\n?]|\.(?!\d)|\s+(?!' + FUNCTION_NAMES + r'\b)[a-zA-Z]{2,}')
+NONLINEAR = re.compile(r'[\^²³⁴⁵]|\*\*|' + FUNCTION_NAMES + r'\s*\(')
+EQUATION = re.compile(r'^(?P<lhs>[^=]+)=(?P<rhs>[^=]+)$')
+NUMBER = re.compile(r'-?\d+(?:\.\d+)?')
+
+
+def scan(question):
+    """Tokenize the question: keyword categories, numbers, components and definition offset"""
+    categories = set()
+    shapes = []
+    numbers = []
+    components = None
+    definition_at = None
+    for match in TOKENS.finditer(question):
+        kind = match.lastgroup
+        if kind == 'word':
+            word = match.group().lower()
+            category = KEYWORDS.get(word)
+            if category is not None:
+                categories.add(category)
+                if category == GEOMETRIC:
+                    shapes.append(word.rstrip('s'))
+        elif kind == 'number':
+            numbers.append(match.group())
+        elif kind == 'components':
+            components = components or NUMBER.findall(match.group())
+            numbers.extend(NUMBER.findall(match.group()))
+        elif kind == 'definition' and definition_at is None:
+            definition_at = match.end()
+    return categories, shapes, numbers, components, definition_at
+
+
+def function_expression(question, definition_at):
+    """The expression to plot: the right-hand side of y = / f(x) =, else the longest math run in x"""
+    if definition_at is not None:
+        rest = question[definition_at:]
+        end = DEFINITION_END.search(rest)
+        expression = (rest[:end.start()] if end else rest).strip()
+        if 'x' in expression:
+            return expression
+
+    runs = [run.strip() for run in EXPRESSION_RUN.findall(question)]
+    runs = [run for run in runs if 'x' in run and any(char.isdigit() or char in '+-*/^²³⁴⁵(' for char in run)]
+    if not runs:
+        return None
+    return max(runs, key=len)
+
+
+def equation_expression(question):
+    """For 'lhs = rhs' in x, plot lhs - rhs so the roots are where it crosses zero"""
+    for part in question.split(','):
+        match = EQUATION.match(part.strip())
+        if not match:
+            continue
+        lhs = function_expression(match.group('lhs'), None)
+        rhs = match.group('rhs').strip().rstrip('?.')
+        if lhs is None:
+            continue
+        if NUMBER.fullmatch(rhs) and float(rhs) == 0:
+            return lhs
+        rhs_expression = function_expression(rhs, None) or (rhs if NUMBER.fullmatch(rhs) else None)
+        if rhs_expression is not None:
+            return f'{lhs} - ({rhs_expression})'
+    return None
+
+
+def classify(question):
+    """Return the VizSpec for a question, or NO_VISUALIZATION"""
+    categories, shapes, numbers, components, definition_at = scan(question)
+
+    if VECTOR in categories and (components or len(numbers) >= 2):
+        return VizSpec(VECTOR, '', ','.join(components or numbers[:2]), 'vector')
+
+    if definition_at is not None or FUNCTION in categories:
+        expression = function_expression(question, definition_at)
+        if expression:
+            return VizSpec(FUNCTION, expression, '', 'function plot')
+
+    if shapes:
+        return VizSpec(GEOMETRIC, question, '', f"{shapes[0]} {' '.join(numbers)}".strip())
+
+    if STATISTICAL in categories and len(numbers) >= 3:
+        return VizSpec(STATISTICAL, '', ','.join(numbers), 'statistical analysis')
+
+    if '=' in question:
+        expression = equation_expression(question.split(':')[-1])
+        if expression:
+            return VizSpec(FUNCTION, expression, '', 'function plot')
+
+    expression = function_expression(question, None)
+    if expression and NONLINEAR.search(expression):
+        return VizSpec(FUNCTION, expression, '', 'function plot')
+
+    if len(numbers) >= 3 and (DATA in categories or STATISTICAL in categories):
+        return VizSpec(DATA, '', ','.join(numbers), 'data visualization')
+
+    return NO_VISUALIZATION
+
+
+def classify_with_answer(question, answer):
+    """Fallback once the answer is known: chart the numbers that the question and answer mention"""
+    numbers = NUMBER.findall(question + answer[:200])
+    if len(numbers) < 3:
+        return NO_VISUALIZATION
+    categories = scan(question)[0]
+    if STATISTICAL in categories:
+        return VizSpec(STATISTICAL, '', ','.join(numbers), 'statistical analysis')
+    return VizSpec(DATA, '', ','.join(numbers), 'data visualization')